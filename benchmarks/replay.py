@@ -0,0 +1,46 @@
+"""
+Replay throughput of fully cached CacheableIteratorWrapper and CacheableAsyncIteratorWrapper instances.
+
+"per-item" iterates the cache through CacheableIterator.__next__, which is what every replay did while
+exhaustion was not being recorded; "fast path" is what iter(wrapper) returns once the wrapper is done.
+The async cases replay through AsyncIteratorWrapper with different yield_every settings.
+
+Usage: python -m benchmarks.replay [items] [repeat]
+"""
+
+import asyncio
+import sys
+import timeit
+
+from cached_iterators import AsyncIteratorWrapper, CacheableIteratorWrapper
+from cached_iterators.sync import CacheableIterator
+
+
+async def _drain(iterator: AsyncIteratorWrapper) -> None:
+    async for _ in iterator:
+        pass
+
+
+def main(items: int = 1_000_000, repeat: int = 5) -> None:
+    wrapper = CacheableIteratorWrapper(iter(range(items)))
+    for _ in wrapper:
+        pass
+    assert wrapper.done
+
+    cases = {
+        "list": lambda: sum(1 for _ in wrapper.values),
+        "per-item": lambda: sum(1 for _ in CacheableIterator(wrapper)),
+        "fast path": lambda: sum(1 for _ in wrapper),
+    }
+    for yield_every in (1, 64, 1024, 0):
+        cases[f"async yield_every={yield_every}"] = lambda yield_every=yield_every: asyncio.run(
+            _drain(AsyncIteratorWrapper(iter(wrapper.values), yield_every=yield_every))
+        )
+
+    for name, case in cases.items():
+        best = min(timeit.repeat(case, number=1, repeat=repeat))
+        print(f"{name:>22}: {items / best / 1e6:8.2f} M items/s")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
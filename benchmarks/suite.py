@@ -0,0 +1,260 @@
+"""
+Benchmark suite for the sync and async wrappers, with machine-readable results that can be compared across
+releases.
+
+Groups:
+
+* ``first_pass``: pulling values through a fresh wrapper against iterating the raw generator.
+* ``replay``: iterating a fully cached wrapper against a plain list and :func:`itertools.tee`.
+* ``scaling``: several threads or tasks consuming one wrapper while it is being filled.
+* ``memory``: bytes allocated per cached value, measured with :mod:`tracemalloc`.
+
+Timings are the best of ``repeat`` runs. The JSON document is written to stdout, or to ``--output``.
+
+Usage: python -m benchmarks.suite [--items N] [--repeat N] [--group NAME ...] [--output PATH]
+"""
+
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+from importlib import metadata
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from cached_iterators import (BlockList, CacheableAsyncIteratorWrapper, CacheableIteratorWrapper,
+                              TypedList)
+
+CONSUMERS = (1, 2, 4, 8)
+
+Result = Dict[str, Any]
+
+
+def _generate(__items: int, /) -> Iterator[int]:
+    yield from range(__items)
+
+
+async def _agenerate(__items: int, /) -> AsyncIterator[int]:
+    for value in range(__items):
+        yield value
+
+
+def _drain(__iterable: Any, /) -> None:
+    for _ in __iterable:
+        pass
+
+
+async def _adrain(__iterable: Any, /) -> None:
+    async for _ in __iterable:
+        pass
+
+
+def _batches(__wrapper: CacheableIteratorWrapper, /, *, size: int = 1024) -> Iterator[List[Any]]:
+    iterator = __wrapper.iter_from(0)
+    while batch := iterator.next_n(size):
+        yield batch
+
+
+def _best(__run: Callable[..., Any], __repeat: int, /, *, setup: Optional[Callable[[], Any]] = None) -> float:
+    """
+    Return the shortest time of several runs of a function. If ``setup`` is given, it is called untimed before
+    every run, and its result is passed to the function.
+    """
+    best = float("inf")
+    for _ in range(__repeat):
+        arguments = () if setup is None else (setup(),)
+        start = time.perf_counter()
+        __run(*arguments)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _timing(__group: str, __name: str, __items: int, __seconds: float, /, **extra: Any) -> Result:
+    return {
+        "group": __group,
+        "name": __name,
+        "items": __items,
+        "seconds": __seconds,
+        "items_per_second": __items / __seconds,
+        **extra,
+    }
+
+
+def first_pass(items: int, repeat: int) -> List[Result]:
+    """
+    Time a first pass through a fresh wrapper against iterating the raw generator.
+    """
+    cases: Dict[str, Callable[[], Any]] = {
+        "generator": lambda: _drain(_generate(items)),
+        "sync wrapper": lambda: _drain(CacheableIteratorWrapper(_generate(items))),
+        "sync wrapper thread_safe": lambda: _drain(CacheableIteratorWrapper(_generate(items), thread_safe=True)),
+        "sync wrapper bounded": lambda: _drain(CacheableIteratorWrapper(_generate(items), bounded=True)),
+        "async generator": lambda: asyncio.run(_adrain(_agenerate(items))),
+        "async wrapper": lambda: asyncio.run(_adrain(CacheableAsyncIteratorWrapper(_agenerate(items)))),
+    }
+    return [_timing("first_pass", name, items, _best(case, repeat)) for name, case in cases.items()]
+
+
+def replay(items: int, repeat: int) -> List[Result]:
+    """
+    Time iterating values that are already cached: a plain list, the second branch of a tee whose first
+    branch has been consumed, and exhausted wrappers.
+    """
+
+    def consumed_tee() -> Iterator[int]:
+        first, second = itertools.tee(_generate(items))
+        _drain(first)
+        return second
+
+    values = list(range(items))
+    wrapper = CacheableIteratorWrapper(_generate(items))
+    _drain(wrapper)
+    async_wrapper = CacheableAsyncIteratorWrapper(_agenerate(items))
+    asyncio.run(_adrain(async_wrapper))
+
+    cases: Dict[str, Callable[[], Any]] = {
+        "list": lambda: _drain(values),
+        "sync wrapper": lambda: _drain(wrapper),
+        "sync wrapper iter_from": lambda: _drain(wrapper.iter_from(0)),
+        "sync wrapper next_n": lambda: _drain(_batches(wrapper)),
+        "async wrapper": lambda: asyncio.run(_adrain(async_wrapper)),
+        "async wrapper iter_from": lambda: asyncio.run(_adrain(async_wrapper.iter_from(0))),
+    }
+    results = [_timing("replay", name, items, _best(case, repeat)) for name, case in cases.items()]
+    results.insert(1, _timing("replay", "tee", items, _best(_drain, repeat, setup=consumed_tee)))
+    return results
+
+
+def scaling(items: int, repeat: int) -> List[Result]:
+    """
+    Time several threads or tasks that each read every value of one fresh wrapper, so that they compete
+    for pulling from the original iterator. Throughput counts the values read by all consumers together.
+    """
+
+    def threads(count: int) -> Callable[[CacheableIteratorWrapper], None]:
+        def run(wrapper: CacheableIteratorWrapper) -> None:
+            workers = [threading.Thread(target=_drain, args=(wrapper,)) for _ in range(count)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+        return run
+
+    async def tasks(count: int) -> None:
+        wrapper = CacheableAsyncIteratorWrapper(_agenerate(items))
+        await asyncio.gather(*(_adrain(wrapper) for _ in range(count)))
+
+    results = []
+    for count in CONSUMERS:
+        seconds = _best(
+            threads(count), repeat, setup=lambda: CacheableIteratorWrapper(_generate(items), thread_safe=True)
+        )
+        results.append(_timing("scaling", "threads", items * count, seconds, consumers=count))
+    for count in CONSUMERS:
+        seconds = _best(lambda: asyncio.run(tasks(count)), repeat)
+        results.append(_timing("scaling", "tasks", items * count, seconds, consumers=count))
+    return results
+
+
+def memory(items: int, repeat: int) -> List[Result]:
+    """
+    Measure the memory that stays allocated once every value is cached, per value, for the storages and
+    for a consumed tee. Values are fresh int objects, so their own size is included except for TypedList.
+    """
+
+    def measure(fill: Callable[[], Any]) -> int:
+        tracemalloc.start()
+        try:
+            kept = fill()  # noqa: F841 - keeps the cache alive while it is measured
+            return tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+
+    def wrapper(storage: Callable[[], Any]) -> Callable[[], CacheableIteratorWrapper]:
+        def fill() -> CacheableIteratorWrapper:
+            cached = CacheableIteratorWrapper(_generate(items), storage=storage)
+            cached.fill_to(items)
+            return cached
+
+        return fill
+
+    def tee() -> Iterator[int]:
+        first, second = itertools.tee(_generate(items))
+        _drain(first)
+        return second
+
+    cases: Dict[str, Callable[[], Any]] = {
+        "list": wrapper(list),
+        "BlockList": wrapper(BlockList),
+        "TypedList q": wrapper(lambda: TypedList("q")),
+        "tee": tee,
+    }
+    results = []
+    for name, fill in cases.items():
+        allocated = measure(fill)
+        results.append(
+            {
+                "group": "memory",
+                "name": name,
+                "items": items,
+                "bytes": allocated,
+                "bytes_per_item": allocated / items,
+            }
+        )
+    return results
+
+
+GROUPS: Dict[str, Callable[[int, int], List[Result]]] = {
+    "first_pass": first_pass,
+    "replay": replay,
+    "scaling": scaling,
+    "memory": memory,
+}
+
+
+def _version() -> Optional[str]:
+    try:
+        return metadata.version("cached-iterators")
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--items", type=int, default=200_000, help="values per run (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per timing (default: %(default)s)")
+    parser.add_argument("--group", action="append", choices=GROUPS, help="run only these groups")
+    parser.add_argument("--output", help="write the JSON document to this file instead of stdout")
+    arguments = parser.parse_args(argv)
+
+    report = {
+        "version": _version(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "items": arguments.items,
+        "repeat": arguments.repeat,
+        "results": [
+            result
+            for group in arguments.group or GROUPS
+            for result in GROUPS[group](arguments.items, arguments.repeat)
+        ],
+    }
+    document = json.dumps(report, indent=2)
+    if arguments.output is None:
+        print(document)
+    else:
+        with open(arguments.output, "w") as file:
+            file.write(document + "\n")
+    return report
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
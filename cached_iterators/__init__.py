@@ -1,4 +1,7 @@
 from ._async import *
+from .shared import *
+from .stats import *
+from .storage import *
 from .sync import *
 
-__all__ = _async.__all__ + sync.__all__
+__all__ = _async.__all__ + shared.__all__ + stats.__all__ + storage.__all__ + sync.__all__
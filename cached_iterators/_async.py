@@ -1,27 +1,137 @@
 import asyncio
-from typing import (AsyncIterable, AsyncIterator, Callable, Iterator, List,
-                    ParamSpec, TypeVar)
+import functools
+import sys
+import time
+import weakref
+from collections import deque
+from concurrent.futures import Executor
+from types import TracebackType
+from typing import (Any, AsyncIterable, AsyncIterator, Awaitable, Callable,
+                    Deque, Dict, Hashable, Iterable, Iterator, List,
+                    Optional, ParamSpec, Sequence, TypeVar, Union, overload)
+from weakref import WeakSet
+
+from ._memo import Memo, make_key
+from .stats import IteratorStats, LatencyHistogram, _TimedAsyncIterator
+from .storage import BlockList, ChunkList, Storage, release, segment
+from .sync import _END, TRIM_INTERVAL, _failed_for, _Failure, _slice_stop
 
 T = TypeVar("T")
 P = ParamSpec("P")
 
 
+async def _prefetch(__iterator: AsyncIterator[T], __queue: "asyncio.Queue[Any]", /) -> None:
+    """
+    Pull values from the original iterator into a bounded queue until it is exhausted. Runs as a task that
+    holds no reference to the wrapper, so the wrapper can be collected.
+
+    :param __iterator: The original iterator.
+    :type __iterator: AsyncIterator[T]
+    :param __queue: The queue of prefetched values; its size is the read-ahead window.
+    :type __queue: asyncio.Queue[Any]
+    """
+    try:
+        async for value in __iterator:
+            await __queue.put(value)
+    except Exception as error:
+        await __queue.put(_Failure(error))
+    else:
+        await __queue.put(_END)
+
+
+def _stop_prefetch(__task: "asyncio.Task[None]", __queue: "asyncio.Queue[Any]", /) -> None:
+    """
+    Cancel a prefetching task and wake up a consumer that is waiting for its next value. Safe to call from
+    any thread, e.g. when the wrapper is collected.
+
+    :param __task: The prefetching task.
+    :type __task: asyncio.Task[None]
+    :param __queue: The queue of prefetched values.
+    :type __queue: asyncio.Queue[Any]
+    """
+
+    def stop() -> None:
+        __task.cancel()
+        while not __queue.empty():
+            __queue.get_nowait()
+        __queue.put_nowait(_END)
+
+    try:
+        __task.get_loop().call_soon_threadsafe(stop)
+    except RuntimeError:
+        # The event loop is closed, and the task with it.
+        pass
+
+
 class AsyncIteratorWrapper(AsyncIterable[T]):
     """
     A wrapper that wraps a synchronous iterator to an asynchronous iterator.
 
+    Control is given back to the event loop once every ``yield_every`` values, so that long synchronous
+    iterators do not starve other tasks without paying for a task switch on every value.
+
+    With ``offload`` set, or an ``executor`` given, the blocking ``next()`` calls run in the executor instead
+    of on the event loop thread: each hop pulls up to ``batch_size`` values, which are then served from a
+    buffer, so the cost of the thread handoff is shared by the batch. An offloaded wrapper is meant to be
+    consumed by one task at a time, e.g. as the original iterator of a :class:`CacheableAsyncIteratorWrapper`
+    (see :meth:`CacheableAsyncIteratorWrapper.from_iterator`).
+
     :param __iterator: The synchronous iterator to wrap.
     :type __iterator: Iterator[T]
+    :param yield_every: How many values to produce between yields to the event loop; 0 never yields. Not
+        used when offloading, since every hop to the executor yields.
+    :type yield_every: int
+    :param offload: Whether to call the synchronous iterator in an executor.
+    :type offload: bool
+    :param executor: The executor to call the synchronous iterator in; implies ``offload``. The default
+        executor of the event loop if None.
+    :type executor: Optional[Executor]
+    :param batch_size: How many values to pull per hop to the executor.
+    :type batch_size: int
     """
 
-    def __init__(self, __iterator: Iterator[T], /) -> None:
+    def __init__(
+        self,
+        __iterator: Iterator[T],
+        /,
+        *,
+        yield_every: int = 1,
+        offload: bool = False,
+        executor: Optional[Executor] = None,
+        batch_size: int = 1,
+    ) -> None:
         """
         Initialize the AsyncIteratorWrapper.
 
         :param __iterator: The synchronous iterator to wrap.
         :type __iterator: Iterator[T]
+        :param yield_every: How many values to produce between yields to the event loop; 0 never yields. Not
+            used when offloading, since every hop to the executor yields.
+        :type yield_every: int
+        :param offload: Whether to call the synchronous iterator in an executor.
+        :type offload: bool
+        :param executor: The executor to call the synchronous iterator in; implies ``offload``. The default
+            executor of the event loop if None.
+        :type executor: Optional[Executor]
+        :param batch_size: How many values to pull per hop to the executor.
+        :type batch_size: int
+
+        :raises ValueError: If yield_every is negative or batch_size is not positive.
         """
+        if yield_every < 0:
+            raise ValueError("yield_every must be non-negative")
+        if batch_size < 1:
+            raise ValueError("batch_size must be positive")
         self.iterator = __iterator
+        self.yield_every = yield_every
+        self._countdown = yield_every
+        self.offload = offload or executor is not None
+        self.executor = executor
+        self.batch_size = batch_size
+        self._buffer: Deque[T] = deque()
+        self._pending: Optional[asyncio.Future[List[T]]] = None
+        self._error: Optional[Exception] = None
+        self._exhausted = False
 
     def __aiter__(self) -> AsyncIterator[T]:
         """
@@ -41,13 +151,65 @@ class AsyncIteratorWrapper(AsyncIterable[T]):
 
         :raises StopAsyncIteration: If the end of the iterator is reached.
         """
+        if self.offload:
+            return await self._offloaded()
+
         try:
-            value = next(self._sync_iterator)
-            await asyncio.sleep(0)  # Allow other tasks to run
-            return value
+            value = next(self.iterator)
         except StopIteration:
             raise StopAsyncIteration()
 
+        if self.yield_every:
+            self._countdown -= 1
+            if not self._countdown:
+                self._countdown = self.yield_every
+                await asyncio.sleep(0)  # Allow other tasks to run
+
+        return value
+
+    async def _offloaded(self) -> T:
+        """
+        Provide the next value from the buffer, pulling the next batch in the executor once it is empty. An
+        error of the synchronous iterator is raised after the values pulled before it.
+
+        :return: The next value from the synchronous iterator.
+        :rtype: T
+
+        :raises StopAsyncIteration: If the end of the iterator is reached.
+        """
+        while not self._buffer:
+            if self._error is not None:
+                error, self._error = self._error, None
+                raise error
+            if self._exhausted:
+                raise StopAsyncIteration()
+            if self._pending is None:
+                self._pending = asyncio.get_running_loop().run_in_executor(self.executor, self._next_batch)
+            # A cancelled consumer leaves the batch pending, so that its values are not lost.
+            batch = await asyncio.shield(self._pending)
+            self._pending = None
+            self._buffer.extend(batch)
+        return self._buffer.popleft()
+
+    def _next_batch(self) -> List[T]:
+        """
+        Pull up to ``batch_size`` values from the synchronous iterator. Runs in the executor.
+
+        :return: The pulled values; fewer if the iterator is exhausted or raised an error.
+        :rtype: List[T]
+        """
+        batch: List[T] = []
+        append = batch.append
+        iterator = self.iterator
+        try:
+            for _ in range(self.batch_size):
+                append(next(iterator))
+        except StopIteration:
+            self._exhausted = True
+        except Exception as error:
+            self._error = error
+        return batch
+
 
 class CacheableAsyncIteratorWrapper(AsyncIterable[T]):
     """
@@ -57,20 +219,156 @@ class CacheableAsyncIteratorWrapper(AsyncIterable[T]):
     This is useful for specific concurrent tasks that need to use the same iterator but cannot do so with
     standard Python means.
 
+    In bounded mode, the wrapper keeps weak references to its live iterators and releases the cached values
+    all of them have already passed (every ``TRIM_INTERVAL`` pulls, or on :meth:`trim`). New iterators start
+    at the oldest value that is still cached.
+
+    With ``prefetch`` set, a producer task pulls up to that many values ahead of the fastest iterator, so
+    that waiting for the original iterator overlaps with the work done on the values. The task waits on the
+    bounded queue while the read-ahead window is full, and is cancelled on :meth:`close` or when the wrapper
+    is collected.
+
+    With ``stats`` set, the wrapper counts pulled and served values, iterators and the time spent waiting for
+    the original iterator in an :class:`IteratorStats`, and ``on_stats`` can export them. With ``latency`` set,
+    every value pulled from the original iterator is timed into a :class:`LatencyHistogram`, and values that
+    take at least ``slow_threshold`` seconds are passed to ``on_slow`` with their index.
+
+    If the original iterator raises an exception, the wrapper keeps it in :attr:`error`: every iterator that
+    reaches the index where it was raised gets it again, instead of a stream that silently ends there.
+
     :param __iterator: The original async iterator to be wrapped.
     :type __iterator: AsyncIterator[T]
+    :param yield_every: How many cached values a replay of the exhausted wrapper produces between yields
+        to the event loop; 0 never yields.
+    :type yield_every: int
+    :param bounded: Whether to release cached values that every live iterator has passed.
+    :type bounded: bool
+    :param storage: A factory of the storage for cached values, e.g. :class:`BlockList`; see :class:`Storage`.
+        Bounded wrappers use a :class:`BlockList` instead of the default list.
+    :type storage: Callable[[], Union[List[T], Storage[T]]]
+    :param prefetch: The number of values to read ahead in a producer task; 0 disables prefetching.
+    :type prefetch: int
+    :param stats: Whether to count the usage of the wrapper in :attr:`stats`.
+    :type stats: bool
+    :param on_stats: A function that is called with the stats as they change; implies ``stats``.
+    :type on_stats: Optional[Callable[[IteratorStats], None]]
+    :param latency: Whether to time every value of the original iterator in :attr:`latency`.
+    :type latency: bool
+    :param slow_threshold: The duration in seconds from which a value is passed to ``on_slow``; implies
+        ``latency``.
+    :type slow_threshold: Optional[float]
+    :param on_slow: A function that is called with the index and the duration of every slow value.
+    :type on_slow: Optional[Callable[[int, float], None]]
     """
 
-    def __init__(self, __iterator: AsyncIterator[T], /):
+    def __init__(
+        self,
+        __iterator: AsyncIterator[T],
+        /,
+        *,
+        yield_every: int = 64,
+        bounded: bool = False,
+        storage: Callable[[], Union[List[T], Storage[T]]] = list,
+        prefetch: int = 0,
+        stats: bool = False,
+        on_stats: Optional[Callable[[IteratorStats], None]] = None,
+        latency: bool = False,
+        slow_threshold: Optional[float] = None,
+        on_slow: Optional[Callable[[int, float], None]] = None,
+    ):
         """
         Initialize the CacheableAsyncIteratorWrapper.
 
         :param __iterator: The original async iterator to be wrapped.
         :type __iterator: AsyncIterator[T]
+        :param yield_every: How many cached values a replay of the exhausted wrapper produces between yields
+            to the event loop; 0 never yields.
+        :type yield_every: int
+        :param bounded: Whether to release cached values that every live iterator has passed.
+        :type bounded: bool
+        :param storage: A factory of the storage for cached values, e.g. :class:`BlockList`; see :class:`Storage`.
+            Bounded wrappers use a :class:`BlockList` instead of the default list.
+        :type storage: Callable[[], Union[List[T], Storage[T]]]
+        :param prefetch: The number of values to read ahead in a producer task; 0 disables prefetching.
+        :type prefetch: int
+        :param stats: Whether to count the usage of the wrapper in :attr:`stats`.
+        :type stats: bool
+        :param on_stats: A function that is called with the stats as they change; implies ``stats``.
+        :type on_stats: Optional[Callable[[IteratorStats], None]]
+        :param latency: Whether to time every value of the original iterator in :attr:`latency`.
+        :type latency: bool
+        :param slow_threshold: The duration in seconds from which a value is passed to ``on_slow``; implies
+            ``latency``.
+        :type slow_threshold: Optional[float]
+        :param on_slow: A function that is called with the index and the duration of every slow value.
+        :type on_slow: Optional[Callable[[int, float], None]]
+
+        :raises ValueError: If yield_every, prefetch or slow_threshold is negative.
         """
+        if yield_every < 0:
+            raise ValueError("yield_every must be non-negative")
+        if prefetch < 0:
+            raise ValueError("prefetch must be non-negative")
+        self.latency: Optional[LatencyHistogram] = None
+        if latency or slow_threshold is not None or on_slow is not None:
+            self.latency = LatencyHistogram(slow_threshold=slow_threshold, on_slow=on_slow)
+            __iterator = _TimedAsyncIterator(__iterator, self.latency)
         self.iterator = __iterator
-        self.values: List[T] = []
+        if bounded and storage is list:
+            # A list cannot release its prefix without shifting indices, so bounded wrappers use blocks.
+            storage = BlockList
+        self.values: Union[List[T], Storage[T]] = storage()
         self.done: bool = False
+        self.error: Optional[Exception] = None
+        self.failed_at: Optional[float] = None
+        self._traceback: Optional[TracebackType] = None
+        self.lock = asyncio.Lock()
+        self._puller: Optional[asyncio.Task[None]] = None
+        self._waiting: List[int] = []
+        self.yield_every = yield_every
+        self.offset: int = 0
+        self.consumers: Optional[WeakSet[CacheableAsyncIterator[T]]] = WeakSet() if bounded else None
+        self.prefetch = prefetch
+        self._queue: Optional[asyncio.Queue[Any]] = None
+        self._prefetcher: Optional[asyncio.Task[None]] = None
+        self._stop: Optional[weakref.finalize] = None
+        self._next_trim = TRIM_INTERVAL
+        self._store: Callable[[Any], None] = self.values.append
+        self.stats: Optional[IteratorStats] = (
+            IteratorStats(self, on_stats=on_stats) if stats or on_stats is not None else None
+        )
+
+    @classmethod
+    def from_iterator(
+        cls,
+        __iterator: Iterator[T],
+        /,
+        *,
+        executor: Optional[Executor] = None,
+        batch_size: int = 64,
+        **options: Any,
+    ) -> "CacheableAsyncIteratorWrapper[T]":
+        """
+        Wrap a blocking synchronous iterator, e.g. a file reader or a synchronous database cursor, whose
+        ``next()`` calls run in an executor in batches, so that they do not block the event loop. Every
+        iterator over the wrapper shares the one offloaded producer.
+
+        :param __iterator: The synchronous iterator to wrap.
+        :type __iterator: Iterator[T]
+        :param executor: The executor to call the iterator in; the default executor of the event loop if None.
+        :type executor: Optional[Executor]
+        :param batch_size: How many values to pull per hop to the executor.
+        :type batch_size: int
+        :param options: The options of the wrapper, e.g. ``bounded`` or ``prefetch``.
+        :type options: Any
+
+        :return: The wrapper.
+        :rtype: CacheableAsyncIteratorWrapper[T]
+
+        :raises ValueError: If batch_size is not positive.
+        """
+        iterator = AsyncIteratorWrapper(__iterator, offload=True, executor=executor, batch_size=batch_size)
+        return cls(iterator, **options)
 
     def __aiter__(self) -> AsyncIterator[T]:
         """
@@ -79,9 +377,335 @@ class CacheableAsyncIteratorWrapper(AsyncIterable[T]):
         :return: An iterator over the cached values.
         :rtype: AsyncIterator[T]
         """
-        if self.done:
-            return AsyncIteratorWrapper(iter(self.values))
-        return CacheableAsyncIterator(self)
+        if self.done and self.error is None and self.consumers is None and self.stats is None:
+            return AsyncIteratorWrapper(iter(self.values), yield_every=self.yield_every)
+        return self._consumer()
+
+    def iter_from(self, __index: int, /) -> "CacheableAsyncIterator[T]":
+        """
+        Return an iterator that starts at an index. Values before it are not read, and the original iterator
+        is only pulled from if the index is beyond the cached values.
+
+        :param __index: The index of the first value.
+        :type __index: int
+
+        :return: An iterator over the values from the index on.
+        :rtype: CacheableAsyncIterator[T]
+
+        :raises ValueError: If the index is negative.
+        :raises IndexError: If the index has been released by a bounded wrapper.
+        """
+        return self._consumer(__index)
+
+    def _consumer(self, __start: Optional[int] = None, /) -> "CacheableAsyncIterator[T]":
+        """
+        Create an iterator over the wrapper, one that counts what it returns if the wrapper has stats.
+
+        :param __start: The index of the first value; the oldest cached value if None.
+        :type __start: Optional[int]
+
+        :return: The iterator.
+        :rtype: CacheableAsyncIterator[T]
+        """
+        if self.stats is None:
+            return CacheableAsyncIterator(self, start=__start)
+        return _CountingAsyncIterator(self, start=__start)
+
+    def _place(self, __consumer: "CacheableAsyncIterator[T]", __index: Optional[int], /) -> None:
+        """
+        Position an iterator at an index, or at the oldest value that is still cached if None. Iterators of a
+        bounded wrapper are tracked from then on.
+
+        :param __consumer: The iterator to position.
+        :type __consumer: CacheableAsyncIterator[T]
+        :param __index: The index of the next value the iterator returns.
+        :type __index: Optional[int]
+
+        :raises ValueError: If the index is negative.
+        :raises IndexError: If the index has been released by a bounded wrapper.
+        """
+        if __index is not None and __index < 0:
+            raise ValueError("index must be non-negative")
+        index = self.offset if __index is None else __index
+        if index < self.offset:
+            raise IndexError("CacheableAsyncIteratorWrapper index has been released")
+        __consumer.index = index
+        __consumer._segment, __consumer._start = (), index
+        if self.consumers is not None:
+            self.consumers.add(__consumer)
+
+    @property
+    def cached_len(self) -> int:
+        """
+        The number of values pulled from the original iterator so far.
+
+        :return: The number of cached values.
+        :rtype: int
+        """
+        return len(self.values)
+
+    async def fill_to(self, __count: int, /) -> int:
+        """
+        Pull values from the original iterator until at least ``__count`` values are cached or it is exhausted.
+
+        :param __count: The number of values that should be cached.
+        :type __count: int
+
+        :return: The number of cached values.
+        :rtype: int
+        """
+        if len(self.values) < __count:
+            await self._fill(__count)
+        return len(self.values)
+
+    @overload
+    def __getitem__(self, __index: int, /) -> Awaitable[T]: ...
+
+    @overload
+    def __getitem__(self, __index: slice, /) -> Awaitable[List[T]]: ...
+
+    def __getitem__(self, __index: Union[int, slice], /) -> Awaitable[Union[T, List[T]]]:
+        """
+        Return an awaitable of the value at an index, or of a list of the values in a slice, that pulls from
+        the original iterator only as far as needed. Negative indices pull until it is exhausted.
+
+        :param __index: The index or slice.
+        :type __index: Union[int, slice]
+
+        :return: The awaitable of the value or the list of values.
+        :rtype: Awaitable[Union[T, List[T]]]
+        """
+        return self._getitem(__index)
+
+    async def _getitem(self, __index: Union[int, slice], /) -> Union[T, List[T]]:
+        """
+        Return the value at an index, or a list of the values in a slice.
+
+        :param __index: The index or slice.
+        :type __index: Union[int, slice]
+
+        :return: The value or the list of values.
+        :rtype: Union[T, List[T]]
+
+        :raises IndexError: If the index is out of range or has been released by a bounded wrapper.
+        """
+        if isinstance(__index, slice):
+            stop = _slice_stop(__index)
+            await self.fill_to(sys.maxsize if stop is None else stop)
+            indices = range(*__index.indices(len(self.values)))
+            if indices and min(indices[0], indices[-1]) < self.offset:
+                raise IndexError("CacheableAsyncIteratorWrapper index has been released")
+            return self.values[__index]
+        await self.fill_to(sys.maxsize if __index < 0 else __index + 1)
+        if __index < 0:
+            __index += len(self.values)
+        if __index < 0 or __index >= len(self.values):
+            raise IndexError("CacheableAsyncIteratorWrapper index out of range")
+        if __index < self.offset:
+            raise IndexError("CacheableAsyncIteratorWrapper index has been released")
+        return self.values[__index]
+
+    def trim(self) -> int:
+        """
+        Release the cached values that every live iterator has already passed. Does nothing unless the
+        wrapper is bounded.
+
+        :return: The number of released values.
+        :rtype: int
+        """
+        if self.consumers is None:
+            return 0
+        # Released values are not deleted from the storage, so that the indices of cached values never
+        # change under iterators that are reading them.
+        low = min((consumer.index for consumer in self.consumers), default=len(self.values))
+        low = min(low, len(self.values))
+        released = low - self.offset
+        if released <= 0:
+            return 0
+        release(self.values, self.offset, low)
+        self.offset = low
+        return released
+
+    async def _fill(self, __count: int, /) -> bool:
+        """
+        Pull values from the original iterator until at least ``__count`` values are cached.
+
+        Only one task pulls from the original iterator at a time, and it belongs to the wrapper: consumers
+        wait for it through :func:`asyncio.shield`, so a consumer that is cancelled while it waits, e.g. by
+        :func:`asyncio.wait_for`, never cancels the pull, and the original iterator stays alive for the others.
+        The task only pulls as many values as the consumers that are still waiting want, and stops once none is.
+
+        :param __count: The number of values that should be cached.
+        :type __count: int
+
+        :return: Whether that many values are cached.
+        :rtype: bool
+
+        :raises Exception: The error of the original iterator, if it raised one before that many values.
+        """
+        values = self.values
+        if len(values) >= __count:
+            return True
+        waiting = self._waiting
+        waiting.append(__count)
+        try:
+            while len(values) < __count:
+                if self.done:
+                    if self.error is not None:
+                        raise self.error.with_traceback(self._traceback)
+                    return False
+                puller = self._puller
+                if puller is None or puller.done():
+                    puller = self._puller = asyncio.get_running_loop().create_task(self._pull())
+                await asyncio.shield(puller)
+            return True
+        finally:
+            # A cancelled consumer no longer counts, so the task stops once nobody needs more values.
+            waiting.remove(__count)
+
+    async def _pull(self) -> None:
+        """
+        Pull values from the original iterator until as many are cached as the consumers still waiting for
+        the task want. Runs as the pulling task of the wrapper; errors of the original iterator are kept by
+        :meth:`_fail` for the consumers to raise.
+        """
+        async with self.lock:
+            values, stats, waiting = self.values, self.stats, self._waiting
+            while waiting and len(values) < max(waiting) and not self.done:
+                try:
+                    advanced = await (self._advance() if stats is None else self._timed_advance(stats))
+                except Exception as error:
+                    self._fail(error)
+                    return
+                if not advanced:
+                    self.done = True
+                    return
+                if self.consumers is not None and len(values) >= self._next_trim:
+                    self.trim()
+                    self._next_trim = len(values) + TRIM_INTERVAL
+
+    def _fail(self, __error: Exception, /) -> None:
+        """
+        Keep the error the original iterator raised, so that it is raised again at the same index instead of
+        pulling from an iterator that is dead; the caller holds the lock.
+
+        :param __error: The error.
+        :type __error: Exception
+        """
+        self.error = __error
+        self.failed_at = time.monotonic()
+        self._traceback = __error.__traceback__
+        self.done = True
+
+    async def _advance(self) -> bool:
+        """
+        Cache at least one more value; the caller holds the lock.
+
+        :return: Whether a value was cached, i.e. False if the original iterator is exhausted.
+        :rtype: bool
+        """
+        if self.prefetch:
+            return await self._receive()
+        try:
+            value = await anext(self.iterator)
+        except StopAsyncIteration:
+            return False
+        self._store(value)
+        return True
+
+    async def _timed_advance(self, __stats: IteratorStats, /) -> bool:
+        """
+        Cache at least one more value and record the pull in the stats, reporting them once the original
+        iterator is exhausted; the caller holds the lock.
+
+        :param __stats: The stats of the wrapper.
+        :type __stats: IteratorStats
+
+        :return: Whether a value was cached, i.e. False if the original iterator is exhausted.
+        :rtype: bool
+        """
+        started = time.perf_counter()
+        advanced = await self._advance()
+        values = self.values
+        __stats._add_pull(len(values), len(values) - self.offset, time.perf_counter() - started)
+        if self.done or not advanced:
+            __stats.report()
+        return advanced
+
+    async def _receive(self) -> bool:
+        """
+        Cache every value the producer task has read ahead, waiting for at least one; the caller holds the
+        lock. Starts the task on first use.
+
+        :return: Whether a value was cached, i.e. False if the original iterator is exhausted.
+        :rtype: bool
+        """
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.prefetch)
+            self._prefetcher = asyncio.get_running_loop().create_task(_prefetch(self.iterator, self._queue))
+            self._stop = weakref.finalize(self, _stop_prefetch, self._prefetcher, self._queue)
+        elif not self._stop.alive:
+            return False
+
+        queue, store = self._queue, self._store
+        item = await queue.get()
+        received = False
+        while True:
+            if item is _END:
+                self.done = True
+                return received
+            if isinstance(item, _Failure):
+                # Like a failing original iterator without prefetching: the values read ahead before the
+                # error are cached, and _fill raises the error once they are passed.
+                if not received:
+                    raise item.error
+                self._fail(item.error)
+                return True
+            store(item)
+            received = True
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return True
+
+    def blocking(self, __loop: Optional[asyncio.AbstractEventLoop] = None, /) -> "BlockingIterable[T]":
+        """
+        Return a blocking view of the wrapper for synchronous code in other threads. Its iterators read cached
+        values directly and only submit pulls from the original iterator to the event loop, so threads and
+        tasks share one cache and one original iterator.
+
+        :param __loop: The event loop the wrapper is used in; the running one if None.
+        :type __loop: Optional[asyncio.AbstractEventLoop]
+
+        :return: The blocking view.
+        :rtype: BlockingIterable[T]
+
+        :raises RuntimeError: If no loop is given and none is running.
+        """
+        return BlockingIterable(self, asyncio.get_running_loop() if __loop is None else __loop)
+
+    def close(self, *, release: bool = False) -> None:
+        """
+        Cancel the producer task. Values cached so far stay available, but no new ones are pulled, unless
+        the storage is released as well.
+
+        :param release: Whether to also close the storage, e.g. the file of a :class:`FileList` or the
+            temporary file of a :class:`SpillList`, after which the cached values are no longer available.
+        :type release: bool
+        """
+        if self._stop is not None:
+            self._stop()
+        self.done = True
+        if self.stats is not None:
+            self.stats.report()
+        if release and not isinstance(self.values, list):
+            self.values.close()
+
+    def __enter__(self) -> "CacheableAsyncIteratorWrapper[T]":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close(release=True)
 
 
 class CacheableAsyncIterator(AsyncIterator[T]):
@@ -92,15 +716,73 @@ class CacheableAsyncIterator(AsyncIterator[T]):
     :type __wrapper: CacheableAsyncIteratorWrapper
     """
 
-    def __init__(self, __wrapper: CacheableAsyncIteratorWrapper, /):
+    def __init__(self, __wrapper: CacheableAsyncIteratorWrapper, /, *, start: Optional[int] = None):
         """
         Initialize the CacheableAsyncIterator.
 
         :param __wrapper: The CacheableAsyncIteratorWrapper instance to iterate over.
         :type __wrapper: CacheableAsyncIteratorWrapper
+        :param start: The index of the first value; the oldest cached value if None.
+        :type start: Optional[int]
+
+        :raises ValueError: If start is negative.
+        :raises IndexError: If start has been released by a bounded wrapper.
         """
         self.wrapper = __wrapper
         self.index = 0
+        self._segment: Sequence[T] = ()
+        self._start = 0
+        if start or __wrapper.consumers is not None:
+            __wrapper._place(self, start)
+
+    def seek(self, __index: int, /) -> None:
+        """
+        Move the iterator, so that the next value it returns is the one at an index.
+
+        :param __index: The index.
+        :type __index: int
+
+        :raises ValueError: If the index is negative.
+        :raises IndexError: If the index has been released by a bounded wrapper.
+        """
+        self.wrapper._place(self, __index)
+
+    async def anext_n(self, __count: int, /) -> List[T]:
+        """
+        Return up to ``__count`` next values at once. Cached values are sliced from the storage, and missing
+        ones are pulled from the original iterator in one go.
+
+        :param __count: The maximum number of values.
+        :type __count: int
+
+        :return: The values; fewer than ``__count`` at the end of the iterator, and none after it.
+        :rtype: List[T]
+
+        :raises Exception: The error of the original iterator, once no value before it is left.
+        """
+        stop = self.index + max(__count, 0)
+        if stop > len(self.wrapper.values):
+            try:
+                await self.wrapper._fill(stop)
+            except Exception:
+                # The values before the error are returned first; the next call raises it.
+                if self.index >= len(self.wrapper.values):
+                    raise
+        stop = min(stop, len(self.wrapper.values))
+        if stop <= self.index:
+            return []
+        values = self.wrapper.values[self.index : stop]
+        self.index = stop
+        return values
+
+    def tell(self) -> int:
+        """
+        Return the index of the next value the iterator returns.
+
+        :return: The index.
+        :rtype: int
+        """
+        return self.index
 
     async def __anext__(self) -> T:
         """
@@ -110,45 +792,629 @@ class CacheableAsyncIterator(AsyncIterator[T]):
         :rtype: T
 
         :raises StopAsyncIteration: If the end of the iterator is reached.
+        :raises Exception: The error of the original iterator, at the index where it was raised.
         """
-        if self.index < len(self.wrapper.values):
-            value = self.wrapper.values[self.index]
-        else:
-            try:
-                value = await anext(self.wrapper.iterator)
-            except StopAsyncIteration:
-                self.wrapper.__done = True
+        position = self.index - self._start
+        if position >= len(self._segment):
+            if self.index >= len(self.wrapper.values) and not await self.wrapper._fill(self.index + 1):
                 raise StopAsyncIteration()
-            else:
-                self.wrapper.values.append(value)
+            if position >= len(self._segment):
+                self._segment, self._start = segment(self.wrapper.values, self.index)
+                position = self.index - self._start
 
+        value = self._segment[position]
         self.index += 1
 
         return value
 
 
+def _in_loop(__loop: asyncio.AbstractEventLoop, /) -> bool:
+    """
+    Return whether the current thread is running an event loop.
+
+    :param __loop: The event loop.
+    :type __loop: asyncio.AbstractEventLoop
+
+    :return: Whether the loop is running in the current thread.
+    :rtype: bool
+    """
+    try:
+        return asyncio.get_running_loop() is __loop
+    except RuntimeError:
+        return False
+
+
+async def _create_consumer(
+    __wrapper: CacheableAsyncIteratorWrapper, __start: Optional[int], /
+) -> CacheableAsyncIterator[T]:
+    """
+    Create an iterator over a wrapper. Runs in the thread of the wrapper's event loop, so that bounded
+    wrappers track the iterator without racing with a trim.
+
+    :param __wrapper: The wrapper.
+    :type __wrapper: CacheableAsyncIteratorWrapper
+    :param __start: The index of the first value; the oldest cached value if None.
+    :type __start: Optional[int]
+
+    :return: The iterator.
+    :rtype: CacheableAsyncIterator[T]
+    """
+    return __wrapper._consumer(__start)
+
+
+class BlockingIterable(Iterable[T]):
+    """
+    A blocking view of a CacheableAsyncIteratorWrapper, see :meth:`CacheableAsyncIteratorWrapper.blocking`.
+
+    :param __wrapper: The CacheableAsyncIteratorWrapper instance to iterate over.
+    :type __wrapper: CacheableAsyncIteratorWrapper
+    :param __loop: The event loop the wrapper is used in.
+    :type __loop: asyncio.AbstractEventLoop
+    """
+
+    def __init__(self, __wrapper: CacheableAsyncIteratorWrapper, __loop: asyncio.AbstractEventLoop, /) -> None:
+        """
+        Initialize the BlockingIterable.
+
+        :param __wrapper: The CacheableAsyncIteratorWrapper instance to iterate over.
+        :type __wrapper: CacheableAsyncIteratorWrapper
+        :param __loop: The event loop the wrapper is used in.
+        :type __loop: asyncio.AbstractEventLoop
+        """
+        self.wrapper = __wrapper
+        self.loop = __loop
+
+    def __iter__(self) -> Iterator[T]:
+        """
+        Return a blocking iterator over the cached values.
+
+        :return: A blocking iterator over the cached values.
+        :rtype: Iterator[T]
+        """
+        wrapper = self.wrapper
+        if wrapper.done and wrapper.error is None and wrapper.consumers is None and wrapper.stats is None:
+            return iter(wrapper.values)
+        return self._iterator(None)
+
+    def iter_from(self, __index: int, /) -> "BlockingIterator[T]":
+        """
+        Return a blocking iterator that starts at an index.
+
+        :param __index: The index of the first value.
+        :type __index: int
+
+        :return: A blocking iterator over the values from the index on.
+        :rtype: BlockingIterator[T]
+
+        :raises ValueError: If the index is negative.
+        :raises IndexError: If the index has been released by a bounded wrapper.
+        """
+        return self._iterator(__index)
+
+    def _iterator(self, __start: Optional[int], /) -> "BlockingIterator[T]":
+        """
+        Create a blocking iterator, one that counts what it returns if the wrapper has stats. It is
+        positioned in the calling thread, unless the wrapper is bounded: then it is positioned in the thread
+        of the event loop, so that it is tracked without racing with a trim.
+
+        :param __start: The index of the first value; the oldest cached value if None.
+        :type __start: Optional[int]
+
+        :return: The blocking iterator.
+        :rtype: BlockingIterator[T]
+        """
+        wrapper = self.wrapper
+        if wrapper.consumers is None or _in_loop(self.loop):
+            consumer = wrapper._consumer(__start)
+        else:
+            future = asyncio.run_coroutine_threadsafe(_create_consumer(wrapper, __start), self.loop)
+            consumer = future.result()
+        if wrapper.stats is None:
+            return BlockingIterator(consumer, self.loop)
+        return _CountingBlockingIterator(consumer, self.loop)
+
+
+class BlockingIterator(Iterator[T]):
+    """
+    A blocking iterator over a CacheableAsyncIteratorWrapper. Cached values are read in the calling thread;
+    missing ones are pulled by the event loop while the calling thread waits.
+
+    :param __consumer: The async iterator that holds the position.
+    :type __consumer: CacheableAsyncIterator[T]
+    :param __loop: The event loop the wrapper is used in.
+    :type __loop: asyncio.AbstractEventLoop
+    """
+
+    def __init__(self, __consumer: CacheableAsyncIterator[T], __loop: asyncio.AbstractEventLoop, /) -> None:
+        """
+        Initialize the BlockingIterator.
+
+        :param __consumer: The async iterator that holds the position.
+        :type __consumer: CacheableAsyncIterator[T]
+        :param __loop: The event loop the wrapper is used in.
+        :type __loop: asyncio.AbstractEventLoop
+        """
+        self.consumer = __consumer
+        self.wrapper = __consumer.wrapper
+        self.loop = __loop
+
+    def _fill(self, __count: int, /) -> bool:
+        """
+        Have the event loop pull values until at least ``__count`` values are cached, and wait for it.
+
+        :param __count: The number of values that should be cached.
+        :type __count: int
+
+        :return: Whether that many values are cached.
+        :rtype: bool
+
+        :raises RuntimeError: If called in the thread of the event loop, which would never get to the pull.
+        """
+        if _in_loop(self.loop):
+            raise RuntimeError("BlockingIterator cannot wait for values in the thread of its event loop")
+        return asyncio.run_coroutine_threadsafe(self.wrapper._fill(__count), self.loop).result()
+
+    def next_n(self, __count: int, /) -> List[T]:
+        """
+        Return up to ``__count`` next values at once, with a single round trip to the event loop for the
+        missing ones.
+
+        :param __count: The maximum number of values.
+        :type __count: int
+
+        :return: The values; fewer than ``__count`` at the end of the iterator, and none after it.
+        :rtype: List[T]
+
+        :raises Exception: The error of the original iterator, once no value before it is left.
+        """
+        consumer = self.consumer
+        stop = consumer.index + max(__count, 0)
+        if stop > len(self.wrapper.values):
+            try:
+                self._fill(stop)
+            except Exception:
+                # The values before the error are returned first; the next call raises it.
+                if consumer.index >= len(self.wrapper.values):
+                    raise
+        stop = min(stop, len(self.wrapper.values))
+        if stop <= consumer.index:
+            return []
+        values = self.wrapper.values[consumer.index : stop]
+        consumer.index = stop
+        return values
+
+    def tell(self) -> int:
+        """
+        Return the index of the next value the iterator returns.
+
+        :return: The index.
+        :rtype: int
+        """
+        return self.consumer.index
+
+    def __next__(self) -> T:
+        """
+        Return the next value from the iterator.
+
+        :return: The next value from the iterator.
+        :rtype: T
+
+        :raises StopIteration: If the end of the iterator is reached.
+        :raises RuntimeError: If a value has to be pulled in the thread of the event loop.
+        """
+        consumer = self.consumer
+        position = consumer.index - consumer._start
+        if position >= len(consumer._segment):
+            if consumer.index >= len(self.wrapper.values) and not self._fill(consumer.index + 1):
+                raise StopIteration()
+            if position >= len(consumer._segment):
+                consumer._segment, consumer._start = segment(self.wrapper.values, consumer.index)
+                position = consumer.index - consumer._start
+
+        value = consumer._segment[position]
+        consumer.index += 1
+
+        return value
+
+
+class _CountingBlockingIterator(BlockingIterator[T]):
+    """
+    A BlockingIterator that counts the values it returns in the stats of its wrapper.
+
+    :param __consumer: The async iterator that holds the position.
+    :type __consumer: CacheableAsyncIterator[T]
+    :param __loop: The event loop the wrapper is used in.
+    :type __loop: asyncio.AbstractEventLoop
+    """
+
+    def next_n(self, __count: int, /) -> List[T]:
+        """
+        Return up to ``__count`` next values at once, counting them.
+
+        :param __count: The maximum number of values.
+        :type __count: int
+
+        :return: The values; fewer than ``__count`` at the end of the iterator, and none after it.
+        :rtype: List[T]
+        """
+        cached = len(self.wrapper.values) - self.consumer.index
+        values = super().next_n(__count)
+        stats = self.wrapper.stats
+        stats.served += len(values)
+        stats.served_from_cache += min(max(cached, 0), len(values))
+        return values
+
+    def __next__(self) -> T:
+        """
+        Return the next value from the iterator, counting it.
+
+        :return: The next value from the iterator.
+        :rtype: T
+
+        :raises StopIteration: If the end of the iterator is reached.
+        """
+        cached = self.consumer.index < len(self.wrapper.values)
+        value = super().__next__()
+        stats = self.wrapper.stats
+        stats.served += 1
+        if cached:
+            stats.served_from_cache += 1
+        return value
+
+
+class _CountingAsyncIterator(CacheableAsyncIterator[T]):
+    """
+    A CacheableAsyncIterator that counts the values it returns in the stats of its wrapper.
+
+    :param __wrapper: The CacheableAsyncIteratorWrapper instance to iterate over.
+    :type __wrapper: CacheableAsyncIteratorWrapper
+    """
+
+    def __init__(self, __wrapper: CacheableAsyncIteratorWrapper, /, *, start: Optional[int] = None):
+        """
+        Initialize the _CountingAsyncIterator.
+
+        :param __wrapper: The CacheableAsyncIteratorWrapper instance to iterate over.
+        :type __wrapper: CacheableAsyncIteratorWrapper
+        :param start: The index of the first value; the oldest cached value if None.
+        :type start: Optional[int]
+        """
+        super().__init__(__wrapper, start=start)
+        __wrapper.stats._add_consumer(self)
+
+    async def anext_n(self, __count: int, /) -> List[T]:
+        """
+        Return up to ``__count`` next values at once, counting them.
+
+        :param __count: The maximum number of values.
+        :type __count: int
+
+        :return: The values; fewer than ``__count`` at the end of the iterator, and none after it.
+        :rtype: List[T]
+        """
+        cached = len(self.wrapper.values) - self.index
+        values = await super().anext_n(__count)
+        stats = self.wrapper.stats
+        stats.served += len(values)
+        stats.served_from_cache += min(max(cached, 0), len(values))
+        return values
+
+    async def __anext__(self) -> T:
+        """
+        Return the next value from the iterator, counting it.
+
+        :return: The next value from the iterator.
+        :rtype: T
+
+        :raises StopAsyncIteration: If the end of the iterator is reached.
+        """
+        cached = self.index < len(self.wrapper.values)
+        value = await super().__anext__()
+        stats = self.wrapper.stats
+        stats.served += 1
+        if cached:
+            stats.served_from_cache += 1
+        return value
+
+
+class CacheableChunkedAsyncIteratorWrapper(CacheableAsyncIteratorWrapper[T]):
+    """
+    A CacheableAsyncIteratorWrapper for an original iterator that produces chunks of values, such as the
+    pages of a paginated API.
+
+    The chunks are cached as they are in a :class:`ChunkList`, so the values are not copied or yielded one by
+    one while they are pulled. Iterating over the wrapper still produces single values, and :meth:`chunks`
+    produces them a chunk at a time for consumers that work in batches. Indices, slices and lengths count
+    single values, except that ``latency`` times whole chunks and passes chunk indices to ``on_slow``.
+
+    :param __iterator: The original async iterator of chunks to be wrapped.
+    :type __iterator: AsyncIterator[Sequence[T]]
+    :param yield_every: How many cached values a replay of the exhausted wrapper produces between yields
+        to the event loop; 0 never yields.
+    :type yield_every: int
+    :param bounded: Whether to release cached chunks that every live iterator has passed.
+    :type bounded: bool
+    :param prefetch: The number of chunks to read ahead in a producer task; 0 disables prefetching.
+    :type prefetch: int
+    :param stats: Whether to count the usage of the wrapper in :attr:`stats`.
+    :type stats: bool
+    :param on_stats: A function that is called with the stats as they change; implies ``stats``.
+    :type on_stats: Optional[Callable[[IteratorStats], None]]
+    :param latency: Whether to time every value of the original iterator in :attr:`latency`.
+    :type latency: bool
+    :param slow_threshold: The duration in seconds from which a value is passed to ``on_slow``; implies
+        ``latency``.
+    :type slow_threshold: Optional[float]
+    :param on_slow: A function that is called with the index and the duration of every slow value.
+    :type on_slow: Optional[Callable[[int, float], None]]
+    """
+
+    def __init__(
+        self,
+        __iterator: AsyncIterator[Sequence[T]],
+        /,
+        *,
+        yield_every: int = 64,
+        bounded: bool = False,
+        prefetch: int = 0,
+        stats: bool = False,
+        on_stats: Optional[Callable[[IteratorStats], None]] = None,
+        latency: bool = False,
+        slow_threshold: Optional[float] = None,
+        on_slow: Optional[Callable[[int, float], None]] = None,
+    ):
+        """
+        Initialize the CacheableChunkedAsyncIteratorWrapper.
+
+        :param __iterator: The original async iterator of chunks to be wrapped.
+        :type __iterator: AsyncIterator[Sequence[T]]
+        :param yield_every: How many cached values a replay of the exhausted wrapper produces between yields
+            to the event loop; 0 never yields.
+        :type yield_every: int
+        :param bounded: Whether to release cached chunks that every live iterator has passed.
+        :type bounded: bool
+        :param prefetch: The number of chunks to read ahead in a producer task; 0 disables prefetching.
+        :type prefetch: int
+        :param stats: Whether to count the usage of the wrapper in :attr:`stats`.
+        :type stats: bool
+        :param on_stats: A function that is called with the stats as they change; implies ``stats``.
+        :type on_stats: Optional[Callable[[IteratorStats], None]]
+        :param latency: Whether to time every value of the original iterator in :attr:`latency`.
+        :type latency: bool
+        :param slow_threshold: The duration in seconds from which a value is passed to ``on_slow``; implies
+            ``latency``.
+        :type slow_threshold: Optional[float]
+        :param on_slow: A function that is called with the index and the duration of every slow value.
+        :type on_slow: Optional[Callable[[int, float], None]]
+
+        :raises ValueError: If yield_every, prefetch or slow_threshold is negative.
+        """
+        super().__init__(
+            __iterator,  # type: ignore[arg-type]
+            yield_every=yield_every,
+            bounded=bounded,
+            storage=ChunkList,
+            prefetch=prefetch,
+            stats=stats,
+            on_stats=on_stats,
+            latency=latency,
+            slow_threshold=slow_threshold,
+            on_slow=on_slow,
+        )
+        self.values: ChunkList[T]
+        self._store = self.values.append_chunk
+
+    def chunks(self) -> AsyncIterator[Sequence[T]]:
+        """
+        Return an iterator over the cached values a chunk at a time. It starts where a new iterator over single
+        values would, and a chunk it starts in the middle of is cut at that point.
+
+        :return: An iterator over the chunks.
+        :rtype: AsyncIterator[Sequence[T]]
+        """
+        return self._chunks(self._consumer())
+
+    async def _chunks(self, __consumer: CacheableAsyncIterator[T], /) -> AsyncIterator[Sequence[T]]:
+        """
+        Produce the chunks from the position of an iterator on, moving it past every chunk produced. The
+        iterator keeps the chunks from being released by a bounded wrapper.
+
+        :param __consumer: The iterator.
+        :type __consumer: CacheableAsyncIterator[T]
+
+        :return: An iterator over the chunks.
+        :rtype: AsyncIterator[Sequence[T]]
+        """
+        values, stats = self.values, self.stats
+        while True:
+            cached = __consumer.index < len(values)
+            if not cached and not await self._fill(__consumer.index + 1):
+                return
+            chunk, start = values.segment(__consumer.index)
+            position = __consumer.index - start
+            __consumer.index = start + len(chunk)
+            if position:
+                chunk = chunk[position:]
+            if stats is not None:
+                stats.served += len(chunk)
+                if cached:
+                    stats.served_from_cache += len(chunk)
+            yield chunk
+            if self.yield_every:
+                await asyncio.sleep(0)  # Allow other tasks to run between cached chunks
+
+
+@overload
 def cacheable_async_iterator(
     __func: Callable[P, AsyncIterator[T]], /
-) -> Callable[P, AsyncIterable[T]]:
+) -> Callable[P, AsyncIterable[T]]: ...
+
+
+@overload
+def cacheable_async_iterator(
+    *,
+    memoize: bool = False,
+    key: Optional[Callable[..., Hashable]] = None,
+    maxsize: Optional[int] = 128,
+    ttl: Optional[float] = None,
+    stale_ttl: Optional[float] = None,
+    error_ttl: Optional[float] = None,
+    **options: Any,
+) -> Callable[[Callable[P, AsyncIterator[T]]], Callable[P, AsyncIterable[T]]]: ...
+
+
+def cacheable_async_iterator(
+    __func: Optional[Callable[P, AsyncIterator[T]]] = None,
+    /,
+    *,
+    memoize: bool = False,
+    key: Optional[Callable[..., Hashable]] = None,
+    maxsize: Optional[int] = 128,
+    ttl: Optional[float] = None,
+    stale_ttl: Optional[float] = None,
+    error_ttl: Optional[float] = None,
+    **options: Any,
+) -> Any:
     """
     Decorator function to convert an async iterator-returning function into one that returns a
     CacheableAsyncIteratorWrapper.
 
+    Can be used bare or with arguments. With ``memoize=True``, concurrent and later calls with the same
+    arguments attach to one wrapper, so they share a single upstream stream. Once a wrapper is ``ttl``
+    seconds old, it keeps being returned for ``stale_ttl`` more seconds while a replacement is filled in a
+    background task; the replacement is only swapped in once it is complete, so readers of the current cache
+    are never blocked by a refresh. A memoized wrapper whose original iterator raised an error replays it to
+    every call; with ``error_ttl``, it is replaced that many seconds after the error, so a failing upstream
+    is retried at most that often. A failed refresh is likewise not retried before ``error_ttl``, or ``ttl``
+    if None, has passed. The decorated function gets a ``cache_clear()`` method.
+
     :param __func: The function that returns an async iterator.
     :type __func: Callable[P, AsyncIterator[T]]
+    :param memoize: Whether to share wrappers between calls with the same arguments.
+    :type memoize: bool
+    :param key: A function of the call arguments that returns the memoization key; by default, the positional
+        arguments and the keyword arguments in any order.
+    :type key: Optional[Callable[..., Hashable]]
+    :param maxsize: The maximum number of memoized wrappers; unbounded if None.
+    :type maxsize: Optional[int]
+    :param ttl: The number of seconds a memoized wrapper is fresh for; unlimited if None.
+    :type ttl: Optional[float]
+    :param stale_ttl: The number of seconds a wrapper older than ``ttl`` keeps being served while it is
+        refreshed in the background; no background refresh if None.
+    :type stale_ttl: Optional[float]
+    :param error_ttl: The number of seconds a memoized wrapper whose original iterator raised an error is
+        reused for after the error; as long as ``ttl`` if None. Requires ``memoize``.
+    :type error_ttl: Optional[float]
+    :param options: Keyword arguments for every CacheableAsyncIteratorWrapper, e.g. ``prefetch=16``. A
+        memoized wrapper cannot be ``bounded``, since later calls replay it from the start.
 
-    :return: A new function that returns a CacheableAsyncIteratorWrapper.
+    :return: A new function that returns a CacheableAsyncIteratorWrapper, or a decorator if ``__func`` is None.
     :rtype: Callable[P, AsyncIterable[T]]
+
+    :raises ValueError: If error_ttl is negative or given without memoize, or memoize is combined with bounded.
     """
+    if memoize and options.get("bounded"):
+        raise ValueError("memoized wrappers cannot be bounded, since later calls replay them from the start")
+    if error_ttl is not None and not memoize:
+        raise ValueError("error_ttl only applies to memoized wrappers")
+    expired = _failed_for(error_ttl)
+
+    def decorator(__func: Callable[P, AsyncIterator[T]], /) -> Callable[P, AsyncIterable[T]]:
+        memo: Optional[Memo[CacheableAsyncIteratorWrapper[T]]] = None
+        if memoize:
+            lifetime = None if ttl is None else ttl + (stale_ttl or 0)
+            memo = Memo(maxsize=maxsize, ttl=lifetime, expired=expired)
+        refreshes: Dict[Hashable, asyncio.Task[None]] = {}
+        failures: Dict[Hashable, float] = {}
+        retry = ttl if error_ttl is None else error_ttl
+
+        async def refresh(
+            __key: Hashable, __factory: Callable[[], CacheableAsyncIteratorWrapper[T]], /
+        ) -> None:
+            task = asyncio.current_task()
+            try:
+                wrapper = __factory()
+                async for _ in wrapper:
+                    pass
+            except Exception:
+                # The stale wrapper keeps being served until it expires for good, and the key is not refreshed
+                # again before the failure is ``error_ttl`` seconds old.
+                if refreshes.get(__key) is task:
+                    failures[__key] = time.monotonic()
+                return
+            finally:
+                current = refreshes.get(__key) is task
+                if current:
+                    del refreshes[__key]
+            # A refresh that was cancelled by cache_clear() must not bring its entry back.
+            if current:
+                failures.pop(__key, None)
+                memo.set(__key, wrapper)
+
+        def retrying(__key: Hashable, /) -> bool:
+            failed_at = failures.get(__key)
+            if failed_at is None:
+                return True
+            if time.monotonic() - failed_at < retry:
+                return False
+            del failures[__key]
+            return True
+
+        @functools.wraps(__func)
+        def inner(*args: P.args, **kwargs: P.kwargs) -> AsyncIterable[T]:
+            """
+            Create a CacheableAsyncIteratorWrapper from the original function, or return the memoized one.
+
+            :param args: Positional arguments to pass to the original function.
+            :param kwargs: Keyword arguments to pass to the original function.
+
+            :return: A CacheableAsyncIteratorWrapper instance.
+            :rtype: AsyncIterable[T]
+            """
+
+            def factory() -> CacheableAsyncIteratorWrapper[T]:
+                return CacheableAsyncIteratorWrapper(__func(*args, **kwargs), **options)
+
+            if memo is None:
+                return factory()
+            cache_key = make_key(args, kwargs) if key is None else key(*args, **kwargs)
+            wrapper, age = memo.get_or_create_with_age(cache_key, factory)
+            stale = ttl is not None and stale_ttl and age >= ttl
+            if stale and cache_key not in refreshes and retrying(cache_key):
+                try:
+                    loop = asyncio.get_running_loop()
+                except RuntimeError:
+                    # Without a running event loop there is nothing to refresh in the background.
+                    wrapper = factory()
+                    memo.set(cache_key, wrapper)
+                else:
+                    refreshes[cache_key] = loop.create_task(refresh(cache_key, factory))
+            return wrapper
+
+        def cache_clear() -> None:
+            if memo is not None:
+                memo.clear()
+            tasks = list(refreshes.values())
+            refreshes.clear()
+            failures.clear()
+            for task in tasks:
+                try:
+                    task.get_loop().call_soon_threadsafe(task.cancel)
+                except RuntimeError:
+                    # The event loop is closed, and the task with it.
+                    pass
 
-    def inner(*args: P.args, **kwargs: P.kwargs) -> AsyncIterable[T]:
-        return CacheableAsyncIteratorWrapper(__func(*args, **kwargs))
+        inner.cache_clear = cache_clear  # type: ignore[attr-defined]
+        return inner
 
-    return inner
+    if __func is None:
+        return decorator
+    return decorator(__func)
 
 
 __all__ = (
     "AsyncIteratorWrapper",
     "CacheableAsyncIteratorWrapper",
+    "CacheableChunkedAsyncIteratorWrapper",
     "cacheable_async_iterator",
 )
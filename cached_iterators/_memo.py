@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import (Any, Callable, Dict, Generic, Hashable, Optional, Tuple,
+                    TypeVar)
+
+V = TypeVar("V")
+
+_KWARGS_MARK = object()
+
+
+def make_key(__args: Tuple[Any, ...], __kwargs: Dict[str, Any], /) -> Hashable:
+    """
+    Build a memoization key from call arguments. Keyword arguments are order-independent.
+
+    :param __args: The positional arguments.
+    :type __args: Tuple[Any, ...]
+    :param __kwargs: The keyword arguments.
+    :type __kwargs: Dict[str, Any]
+
+    :return: The key.
+    :rtype: Hashable
+    """
+    if not __kwargs:
+        return __args
+    return __args + (_KWARGS_MARK,) + tuple(sorted(__kwargs.items()))
+
+
+class Memo(Generic[V]):
+    """
+    A thread-safe LRU mapping whose entries expire ``ttl`` seconds after they were stored, or earlier once
+    ``expired`` returns True for them.
+
+    :param maxsize: The maximum number of entries; unbounded if None.
+    :type maxsize: Optional[int]
+    :param ttl: The lifetime of entries in seconds; unlimited if None.
+    :type ttl: Optional[float]
+    :param expired: A predicate of entries that expire before their lifetime is over.
+    :type expired: Optional[Callable[[V], bool]]
+    """
+
+    def __init__(
+        self,
+        *,
+        maxsize: Optional[int] = 128,
+        ttl: Optional[float] = None,
+        expired: Optional[Callable[[V], bool]] = None,
+    ) -> None:
+        """
+        Initialize the Memo.
+
+        :param maxsize: The maximum number of entries; unbounded if None.
+        :type maxsize: Optional[int]
+        :param ttl: The lifetime of entries in seconds; unlimited if None.
+        :type ttl: Optional[float]
+        :param expired: A predicate of entries that expire before their lifetime is over.
+        :type expired: Optional[Callable[[V], bool]]
+
+        :raises ValueError: If maxsize or ttl is not positive.
+        """
+        if maxsize is not None and maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.expired = expired
+        self.lock = threading.RLock()
+        self.entries: "OrderedDict[Hashable, Tuple[V, float]]" = OrderedDict()
+
+    def get_or_create(self, __key: Hashable, __factory: Callable[[], V], /) -> V:
+        """
+        Return the live entry for a key, or store and return a new one made by a factory.
+
+        :param __key: The key.
+        :type __key: Hashable
+        :param __factory: The factory of the new entry.
+        :type __factory: Callable[[], V]
+
+        :return: The entry.
+        :rtype: V
+        """
+        return self.get_or_create_with_age(__key, __factory)[0]
+
+    def get_or_create_with_age(self, __key: Hashable, __factory: Callable[[], V], /) -> Tuple[V, float]:
+        """
+        Return the live entry for a key, or store and return a new one made by a factory, together with the
+        number of seconds since the entry was stored.
+
+        :param __key: The key.
+        :type __key: Hashable
+        :param __factory: The factory of the new entry.
+        :type __factory: Callable[[], V]
+
+        :return: The entry and its age.
+        :rtype: Tuple[V, float]
+        """
+        with self.lock:
+            entry = self.entries.get(__key)
+            if entry is not None:
+                age = time.monotonic() - entry[1]
+                if (self.ttl is None or age < self.ttl) and not (self.expired and self.expired(entry[0])):
+                    self.entries.move_to_end(__key)
+                    return entry[0], age
+            value = __factory()
+            self.set(__key, value)
+            return value, 0.0
+
+    def set(self, __key: Hashable, __value: V, /) -> None:
+        """
+        Store an entry, evicting the least recently used ones over maxsize.
+
+        :param __key: The key.
+        :type __key: Hashable
+        :param __value: The entry.
+        :type __value: V
+        """
+        with self.lock:
+            self.entries[__key] = (__value, time.monotonic())
+            self.entries.move_to_end(__key)
+            if self.maxsize is not None:
+                while len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Remove all entries.
+        """
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self) -> int:
+        """
+        Return the number of stored entries, including expired ones that were not evicted yet.
+
+        :return: The number of entries.
+        :rtype: int
+        """
+        return len(self.entries)
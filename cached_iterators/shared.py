@@ -0,0 +1,593 @@
+import pickle
+import struct
+import sys
+import time
+import weakref
+from itertools import repeat
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import (Any, Iterator, List, Optional, Sequence, Tuple, TypeVar,
+                    Union, overload)
+
+from .storage import Serializer
+from .sync import CacheableIteratorWrapper
+
+T = TypeVar("T")
+
+# Header: magic, flags, capacity of the offset index, size of the data region, number of published values
+# and number of used data bytes. The offset index follows, then the data region.
+_HEADER = struct.Struct("<4sB3xQQQQ")
+_MAGIC = b"CIT1"
+_FLAGS = 4
+_COUNT = 24
+_USED = 32
+
+DONE = 1
+TRUNCATED = 2
+FAILED = 4
+
+
+def _attach(__name: str, /) -> SharedMemory:
+    """
+    Attach to an existing shared memory block without taking ownership of it. Before Python 3.13, attaching
+    registers the block with the resource tracker, which unlinks it when the tracker exits; processes that
+    do not share the tracker of the creating process, i.e. were not started by it through multiprocessing,
+    have to unregister it again.
+
+    :param __name: The name of the block.
+    :type __name: str
+
+    :return: The shared memory block.
+    :rtype: SharedMemory
+    """
+    if sys.version_info >= (3, 13):
+        return SharedMemory(__name, track=False)
+    inherited = getattr(resource_tracker._resource_tracker, "_fd", None) is not None
+    memory = SharedMemory(__name)
+    if not inherited:
+        resource_tracker.unregister(memory._name, "shared_memory")  # type: ignore[attr-defined]
+    return memory
+
+
+class SharedList(Sequence[T]):
+    """
+    An append-only list-like storage whose values are also published, serialized, in a shared memory block,
+    so that other processes can attach to it by name and read them without a round trip per value.
+
+    The block holds a header, an index of value end offsets and the data of the serialized values. The one
+    process that creates the list appends to it and keeps its own values in memory as well; processes that
+    :meth:`attach` to it read the values published so far, decoding ``read_ahead`` of them per page. A value
+    is published by writing its data, then its offset and then the new count, so readers always see a
+    complete prefix. Once ``capacity`` values or ``size`` bytes of data are published, later values are
+    kept by the creating process only and the block is marked as truncated. If the original iterator of the
+    creating process fails, the block is marked as failed, with the pickled error after the published data
+    if it fits, and readers that follow the list raise it at that point.
+
+    :param __name: The name of the shared memory block; a unique one if None.
+    :type __name: Optional[str]
+    :param size: The number of bytes for the serialized values.
+    :type size: int
+    :param capacity: The maximum number of published values.
+    :type capacity: int
+    :param serializer: The serializer for published values.
+    :type serializer: Serializer
+    :param read_ahead: The number of values decoded at once by sequential readers.
+    :type read_ahead: int
+    """
+
+    def __init__(
+        self,
+        __name: Optional[str] = None,
+        /,
+        *,
+        size: int = 64 << 20,
+        capacity: int = 1 << 20,
+        serializer: Serializer = pickle,
+        read_ahead: int = 1024,
+    ) -> None:
+        """
+        Create the SharedList and its shared memory block.
+
+        :param __name: The name of the shared memory block; a unique one if None.
+        :type __name: Optional[str]
+        :param size: The number of bytes for the serialized values.
+        :type size: int
+        :param capacity: The maximum number of published values.
+        :type capacity: int
+        :param serializer: The serializer for published values.
+        :type serializer: Serializer
+        :param read_ahead: The number of values decoded at once by sequential readers.
+        :type read_ahead: int
+
+        :raises ValueError: If size, capacity or read_ahead is not positive.
+        :raises FileExistsError: If a shared memory block with the name exists.
+        """
+        if size <= 0 or capacity <= 0 or read_ahead <= 0:
+            raise ValueError("size, capacity and read_ahead must be positive")
+        memory = SharedMemory(__name, create=True, size=_HEADER.size + capacity * 8 + size)
+        _HEADER.pack_into(memory.buf, 0, _MAGIC, 0, capacity, size, 0, 0)
+        self._open(memory, serializer, read_ahead)
+        self.owner = True
+        self._local: Optional[List[T]] = []
+
+    @classmethod
+    def attach(
+        cls, __name: str, /, *, serializer: Serializer = pickle, read_ahead: int = 1024
+    ) -> "SharedList[T]":
+        """
+        Attach to the shared memory block of a SharedList created by another process, for reading.
+
+        :param __name: The name of the shared memory block.
+        :type __name: str
+        :param serializer: The serializer of the published values.
+        :type serializer: Serializer
+        :param read_ahead: The number of values decoded at once by sequential readers.
+        :type read_ahead: int
+
+        :return: The attached SharedList.
+        :rtype: SharedList[T]
+
+        :raises FileNotFoundError: If there is no shared memory block with the name.
+        :raises ValueError: If the block does not hold a SharedList, or read_ahead is not positive.
+        """
+        if read_ahead <= 0:
+            raise ValueError("read_ahead must be positive")
+        memory = _attach(__name)
+        if bytes(memory.buf[:4]) != _MAGIC:
+            memory.close()
+            raise ValueError(f"shared memory block {__name!r} does not hold a SharedList")
+        self = cls.__new__(cls)
+        self._open(memory, serializer, read_ahead)
+        self.owner = False
+        self._local = None
+        return self
+
+    def _open(self, __memory: SharedMemory, __serializer: Serializer, __read_ahead: int, /) -> None:
+        """
+        Set up the views of a shared memory block.
+
+        :param __memory: The shared memory block.
+        :type __memory: SharedMemory
+        :param __serializer: The serializer of the published values.
+        :type __serializer: Serializer
+        :param __read_ahead: The number of values decoded at once by sequential readers.
+        :type __read_ahead: int
+        """
+        _, _, capacity, size, _, _ = _HEADER.unpack_from(__memory.buf, 0)
+        self.serializer = __serializer
+        self.read_ahead = __read_ahead
+        self.capacity = capacity
+        self.size = size
+        self._memory = __memory
+        self._offsets = __memory.buf[_HEADER.size : _HEADER.size + capacity * 8].cast("Q")
+        self._data = __memory.buf[_HEADER.size + capacity * 8 : _HEADER.size + capacity * 8 + size]
+        self._count = 0
+        self._used = 0
+        self._trimmed = 0  # Index of the first local value that has not been released.
+
+    @property
+    def name(self) -> str:
+        """
+        The name of the shared memory block, for :meth:`attach`.
+
+        :return: The name.
+        :rtype: str
+        """
+        return self._memory.name
+
+    @property
+    def published(self) -> int:
+        """
+        The number of values published in the shared memory block.
+
+        :return: The number of published values.
+        :rtype: int
+        """
+        return struct.unpack_from("<Q", self._memory.buf, _COUNT)[0]
+
+    @property
+    def done(self) -> bool:
+        """
+        Whether the creating process has marked the values as complete.
+
+        :return: Whether no more values will be published.
+        :rtype: bool
+        """
+        return bool(self._memory.buf[_FLAGS] & (DONE | TRUNCATED | FAILED))
+
+    @property
+    def truncated(self) -> bool:
+        """
+        Whether the shared memory block ran out of room, so that later values were not published.
+
+        :return: Whether values are missing from the block.
+        :rtype: bool
+        """
+        return bool(self._memory.buf[_FLAGS] & TRUNCATED)
+
+    @property
+    def failed(self) -> bool:
+        """
+        Whether the original iterator of the creating process failed after the published values.
+
+        :return: Whether the values end with an error.
+        :rtype: bool
+        """
+        return bool(self._memory.buf[_FLAGS] & FAILED)
+
+    @property
+    def error(self) -> Optional[BaseException]:
+        """
+        The error the original iterator of the creating process failed with, if it was published.
+
+        :return: The error; None if the list did not fail, or the error could not be published or loaded.
+        :rtype: Optional[BaseException]
+        """
+        if not self.failed:
+            return None
+        count, used = struct.unpack_from("<QQ", self._memory.buf, _COUNT)
+        # The error follows the published data, and the slot after the last offset holds its end.
+        if count >= self.capacity or self._offsets[count] <= used:
+            return None
+        try:
+            return pickle.loads(self._data[used : self._offsets[count]])
+        except Exception:
+            return None
+
+    def append(self, __value: T, /) -> None:
+        """
+        Append a value to the end of the storage and publish it, unless the block is full.
+
+        :param __value: The value to append.
+        :type __value: T
+
+        :raises TypeError: If the list is attached rather than created by this process.
+        """
+        if self._local is None:
+            raise TypeError("an attached SharedList is read-only")
+        self._local.append(__value)
+        if self._memory.buf[_FLAGS] & TRUNCATED:
+            return
+        data = self.serializer.dumps(__value)
+        used = self._used + len(data)
+        if self._count >= self.capacity or used > self.size:
+            self._memory.buf[_FLAGS] |= TRUNCATED
+            return
+        self._data[self._used : used] = data
+        self._offsets[self._count] = used
+        self._used = used
+        self._count += 1
+        struct.pack_into("<Q", self._memory.buf, _USED, used)
+        struct.pack_into("<Q", self._memory.buf, _COUNT, self._count)
+
+    def finish(self) -> None:
+        """
+        Mark the values as complete, so that readers that follow the list stop at its end.
+        """
+        if self.owner:
+            self._memory.buf[_FLAGS] |= DONE
+
+    def fail(self, __error: BaseException, /) -> None:
+        """
+        Mark the values as ending with an error, so that readers that follow the list raise it at their end.
+        The error is pickled after the published data if it fits; it is never passed through the serializer.
+
+        :param __error: The error of the original iterator.
+        :type __error: BaseException
+        """
+        if not self.owner:
+            return
+        try:
+            data = pickle.dumps(__error)
+        except Exception:
+            data = b""
+        end = self._used + len(data)
+        if data and self._count < self.capacity and end <= self.size:
+            self._data[self._used : end] = data
+            self._offsets[self._count] = end
+        self._memory.buf[_FLAGS] |= FAILED
+
+    def _load(self, __start: int, __stop: int, /) -> List[T]:
+        """
+        Decode the published values in ``[__start, __stop)``.
+
+        :param __start: The index of the first value.
+        :type __start: int
+        :param __stop: The index after the last value.
+        :type __stop: int
+
+        :return: The values.
+        :rtype: List[T]
+        """
+        loads, data, offsets = self.serializer.loads, self._data, self._offsets
+        position = offsets[__start - 1] if __start else 0
+        values = []
+        for index in range(__start, __stop):
+            end = offsets[index]
+            values.append(loads(data[position:end]))
+            position = end
+        return values
+
+    def segment(self, __index: int, /) -> Tuple[Sequence[T], int]:
+        """
+        Return the values of the creating process, or a page of decoded published values starting at an
+        index, together with the index of its first value.
+
+        :param __index: The index.
+        :type __index: int
+
+        :return: The segment and the index of its first value.
+        :rtype: Tuple[Sequence[T], int]
+        """
+        if self._local is not None:
+            return self._local, 0
+        return self._load(__index, min(__index + self.read_ahead, self.published)), __index
+
+    def trim(self, __index: int, /) -> int:
+        """
+        Release the values of the creating process before ``__index``. Published values stay in the block.
+
+        :param __index: The index of the first value that has to stay available.
+        :type __index: int
+
+        :return: The number of released values.
+        :rtype: int
+        """
+        if self._local is None:
+            return 0
+        __index = min(__index, len(self._local))
+        released = __index - self._trimmed
+        if released <= 0:
+            return 0
+        self._local[self._trimmed : __index] = repeat(None, released)
+        self._trimmed = __index
+        return released
+
+    def follow(self, *, poll_interval: float = 0.01, timeout: Optional[float] = None) -> Iterator[T]:
+        """
+        Return an iterator over the published values that waits for new ones until the creating process
+        marks the list as complete.
+
+        :param poll_interval: The number of seconds to sleep while no new value is published.
+        :type poll_interval: float
+        :param timeout: The number of seconds to wait for a new value before giving up; forever if None.
+        :type timeout: Optional[float]
+
+        :return: An iterator over the values.
+        :rtype: Iterator[T]
+
+        :raises BufferError: At the end of the published values, if the block ran out of room.
+        :raises TimeoutError: If no new value is published within the timeout.
+        :raises Exception: At the end of the published values, the error of the original iterator of the
+            creating process if it failed; a RuntimeError if that error could not be published.
+        """
+        index = 0
+        deadline: Optional[float] = None
+        while True:
+            done = self.done
+            published = self.published
+            if index < published:
+                deadline = None
+                page = self._load(index, min(index + self.read_ahead, published))
+                index += len(page)
+                yield from page
+            elif done:
+                if self.truncated:
+                    raise BufferError(f"shared memory block {self.name!r} ran out of room")
+                if self.failed:
+                    error = self.error
+                    if error is None:
+                        raise RuntimeError(f"the original iterator of shared memory block {self.name!r} failed")
+                    raise error
+                return
+            else:
+                if timeout is not None:
+                    now = time.monotonic()
+                    if deadline is None:
+                        deadline = now + timeout
+                    elif now >= deadline:
+                        raise TimeoutError(f"no value was published in shared memory block {self.name!r} in time")
+                time.sleep(poll_interval)
+
+    def close(self) -> None:
+        """
+        Close this process's access to the shared memory block.
+        """
+        self._offsets.release()
+        self._data.release()
+        self._memory.close()
+
+    def unlink(self) -> None:
+        """
+        Destroy the shared memory block once every process has closed it. Only the creating process can.
+
+        :raises TypeError: If the list is attached rather than created by this process.
+        """
+        if not self.owner:
+            raise TypeError("only the process that created a SharedList can unlink it")
+        self._memory.unlink()
+
+    def __len__(self) -> int:
+        """
+        Return the number of values: all appended ones in the creating process, the published ones elsewhere.
+
+        :return: The number of values.
+        :rtype: int
+        """
+        return self.published if self._local is None else len(self._local)
+
+    @overload
+    def __getitem__(self, __index: int, /) -> T: ...
+
+    @overload
+    def __getitem__(self, __index: slice, /) -> List[T]: ...
+
+    def __getitem__(self, __index: Union[int, slice], /) -> Union[T, List[T]]:
+        """
+        Return the value at an index, or a list of the values in a slice.
+
+        :param __index: The index or slice.
+        :type __index: Union[int, slice]
+
+        :return: The value or the list of values.
+        :rtype: Union[T, List[T]]
+
+        :raises IndexError: If the index is out of range.
+        """
+        if self._local is not None:
+            return self._local[__index]
+        length = self.published
+        if isinstance(__index, slice):
+            start, stop, step = __index.indices(length)
+            if step != 1:
+                return [self[index] for index in range(start, stop, step)]
+            return self._load(start, max(stop, start))
+        if __index < 0:
+            __index += length
+        if __index < 0 or __index >= length:
+            raise IndexError("SharedList index out of range")
+        return self._load(__index, __index + 1)[0]
+
+    def __iter__(self) -> Iterator[T]:
+        """
+        Return an iterator over the values, without waiting for new ones.
+
+        :return: An iterator over the values.
+        :rtype: Iterator[T]
+        """
+        if self._local is not None:
+            return iter(self._local)
+        return self._iter_published()
+
+    def _iter_published(self) -> Iterator[T]:
+        index, published = 0, self.published
+        while index < published:
+            page = self._load(index, min(index + self.read_ahead, published))
+            index += len(page)
+            yield from page
+
+    def __enter__(self) -> "SharedList[T]":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.name!r}, len={len(self)}, owner={self.owner})"
+
+
+def _abandon(__values: "SharedList[Any]", /) -> None:
+    """
+    Mark the shared list of a SharedIteratorWrapper that was collected without being closed as failed,
+    unless it is complete, so that readers that follow it stop instead of waiting for values forever.
+
+    :param __values: The shared list.
+    :type __values: SharedList[Any]
+    """
+    if not __values.done:
+        __values.fail(RuntimeError("the SharedIteratorWrapper was collected before its iterator was exhausted"))
+
+
+class SharedIteratorWrapper(CacheableIteratorWrapper[T]):
+    """
+    A CacheableIteratorWrapper that publishes the values it caches in a :class:`SharedList`, so that worker
+    processes can replay them with ``SharedList.attach(wrapper.name)`` instead of running the original
+    iterator again. The list is marked as complete once the original iterator is exhausted or the wrapper
+    is closed, and as failed with its error if the original iterator raises one, or with a RuntimeError if the
+    wrapper is collected before either.
+
+    :param __iterator: The original iterator to be wrapped.
+    :type __iterator: Iterator[T]
+    :param name: The name of the shared memory block; a unique one if None.
+    :type name: Optional[str]
+    :param size: The number of bytes for the serialized values.
+    :type size: int
+    :param capacity: The maximum number of published values.
+    :type capacity: int
+    :param serializer: The serializer for published values.
+    :type serializer: Serializer
+    :param options: Other keyword arguments of CacheableIteratorWrapper, except ``storage``.
+    """
+
+    def __init__(
+        self,
+        __iterator: Iterator[T],
+        /,
+        *,
+        name: Optional[str] = None,
+        size: int = 64 << 20,
+        capacity: int = 1 << 20,
+        serializer: Serializer = pickle,
+        **options: Any,
+    ) -> None:
+        """
+        Initialize the SharedIteratorWrapper and create its shared memory block.
+
+        :param __iterator: The original iterator to be wrapped.
+        :type __iterator: Iterator[T]
+        :param name: The name of the shared memory block; a unique one if None.
+        :type name: Optional[str]
+        :param size: The number of bytes for the serialized values.
+        :type size: int
+        :param capacity: The maximum number of published values.
+        :type capacity: int
+        :param serializer: The serializer for published values.
+        :type serializer: Serializer
+        :param options: Other keyword arguments of CacheableIteratorWrapper, except ``storage``.
+
+        :raises FileExistsError: If a shared memory block with the name exists.
+        """
+        super().__init__(
+            __iterator,
+            storage=lambda: SharedList(name, size=size, capacity=capacity, serializer=serializer),
+            **options,
+        )
+        self.values: SharedList[T]
+        self._abandon = weakref.finalize(self, _abandon, self.values)
+
+    @property
+    def name(self) -> str:
+        """
+        The name of the shared memory block, for :meth:`SharedList.attach`.
+
+        :return: The name.
+        :rtype: str
+        """
+        return self.values.name
+
+    def _pull(self, __count: int, /) -> bool:
+        try:
+            return super()._pull(__count)
+        finally:
+            if self.error is not None:
+                self.values.fail(self.error)
+            elif self.done:
+                self.values.finish()
+
+    def close(self, *, release: bool = False) -> None:
+        """
+        Stop prefetching and mark the shared list as complete. The shared memory block stays available
+        until :meth:`unlink`.
+
+        :param release: Whether to also close this process's access to the shared memory block.
+        :type release: bool
+        """
+        super().close()
+        self._abandon.detach()
+        self.values.finish()
+        if release:
+            self.values.close()
+
+    def unlink(self) -> None:
+        """
+        Destroy the shared memory block once every process has closed it.
+        """
+        self._abandon.detach()
+        self.values.close()
+        self.values.unlink()
+
+
+__all__ = (
+    "SharedIteratorWrapper",
+    "SharedList",
+)
@@ -0,0 +1,349 @@
+import sys
+import time
+import weakref
+from typing import (Any, AsyncIterator, Callable, Dict, Iterator, List,
+                    Optional, Sequence, Tuple, TypeVar)
+from weakref import WeakSet
+
+T = TypeVar("T")
+
+REPORT_INTERVAL = 1024
+
+_SAMPLE_SIZE = 64
+_POINTER_SIZE = 8
+
+
+def _estimate_bytes(__values: Sequence[Any], __start: int, /) -> int:
+    """
+    Estimate the memory held by the values of a storage from an index on. Storages that know their size
+    through an ``nbytes`` attribute report it; otherwise up to ``_SAMPLE_SIZE`` evenly spread values are
+    measured with :func:`sys.getsizeof`, and a pointer is added per value.
+
+    :param __values: The storage.
+    :type __values: Sequence[Any]
+    :param __start: The index of the first value that has not been released.
+    :type __start: int
+
+    :return: The estimated number of bytes.
+    :rtype: int
+    """
+    nbytes = getattr(__values, "nbytes", None)
+    if nbytes is not None:
+        return nbytes
+    held = len(__values) - __start
+    if held <= 0:
+        return 0
+    step = max(held // _SAMPLE_SIZE, 1)
+    sample = [sys.getsizeof(__values[index]) for index in range(__start, len(__values), step)]
+    return round(held * (_POINTER_SIZE + sum(sample) / len(sample)))
+
+
+class IteratorStats:
+    """
+    Counters of how a wrapper and its iterators are used, for wrappers created with ``stats=True``.
+
+    The counters are updated by the wrapper while it pulls values and by its iterators while they return
+    them; they are not synchronized, so under concurrent threads ``served`` and ``served_from_cache`` are
+    approximate. The properties are computed from the wrapper when they are read.
+
+    :param __wrapper: The wrapper whose usage is counted.
+    :type __wrapper: Any
+    :param on_stats: A function that is called with the stats every ``REPORT_INTERVAL`` pulled values, when
+        the original iterator is exhausted and when the wrapper is closed.
+    :type on_stats: Optional[Callable[[IteratorStats], None]]
+    """
+
+    def __init__(
+        self, __wrapper: Any, /, *, on_stats: Optional[Callable[["IteratorStats"], None]] = None
+    ) -> None:
+        """
+        Initialize the IteratorStats.
+
+        :param __wrapper: The wrapper whose usage is counted.
+        :type __wrapper: Any
+        :param on_stats: A function that is called with the stats every ``REPORT_INTERVAL`` pulled values,
+            when the original iterator is exhausted and when the wrapper is closed.
+        :type on_stats: Optional[Callable[[IteratorStats], None]]
+        """
+        self.pulled = 0
+        self.served = 0
+        self.served_from_cache = 0
+        self.total_consumers = 0
+        self.peak_length = 0
+        self.upstream_wait = 0.0
+        self.on_stats = on_stats
+        self.consumers: WeakSet[Any] = WeakSet()
+        self._wrapper = weakref.ref(__wrapper)
+        self._next_report = REPORT_INTERVAL
+
+    @property
+    def active_consumers(self) -> int:
+        """
+        The number of iterators over the wrapper that are still alive.
+
+        :return: The number of live iterators.
+        :rtype: int
+        """
+        return len(self.consumers)
+
+    @property
+    def length(self) -> int:
+        """
+        The number of values the wrapper holds, i.e. not counting released ones.
+
+        :return: The number of held values.
+        :rtype: int
+        """
+        wrapper = self._wrapper()
+        return 0 if wrapper is None else len(wrapper.values) - wrapper.offset
+
+    @property
+    def bytes_held(self) -> int:
+        """
+        An estimate of the memory held by the wrapper's values.
+
+        :return: The estimated number of bytes.
+        :rtype: int
+        """
+        wrapper = self._wrapper()
+        return 0 if wrapper is None else _estimate_bytes(wrapper.values, wrapper.offset)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Return every counter and property by name, e.g. for a metrics exporter.
+
+        :return: The counters.
+        :rtype: Dict[str, Any]
+        """
+        return {
+            "pulled": self.pulled,
+            "served": self.served,
+            "served_from_cache": self.served_from_cache,
+            "active_consumers": self.active_consumers,
+            "total_consumers": self.total_consumers,
+            "length": self.length,
+            "peak_length": self.peak_length,
+            "bytes_held": self.bytes_held,
+            "upstream_wait": self.upstream_wait,
+        }
+
+    def report(self) -> None:
+        """
+        Call the ``on_stats`` function with the stats, if there is one.
+        """
+        if self.on_stats is not None:
+            self.on_stats(self)
+
+    def _add_consumer(self, __consumer: Any, /) -> None:
+        """
+        Count a new iterator over the wrapper.
+
+        :param __consumer: The iterator.
+        :type __consumer: Any
+        """
+        self.consumers.add(__consumer)
+        self.total_consumers += 1
+
+    def _add_pull(self, __pulled: int, __length: int, __wait: float, /) -> None:
+        """
+        Record a pull from the original iterator, reporting the stats every ``REPORT_INTERVAL`` values.
+
+        :param __pulled: The number of values pulled so far.
+        :type __pulled: int
+        :param __length: The number of values the wrapper holds after the pull.
+        :type __length: int
+        :param __wait: The number of seconds the pull took.
+        :type __wait: float
+        """
+        self.pulled = __pulled
+        self.peak_length = max(self.peak_length, __length)
+        self.upstream_wait += __wait
+        if __pulled >= self._next_report:
+            self._next_report = __pulled + REPORT_INTERVAL
+            self.report()
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={value!r}" for name, value in self.as_dict().items())
+        return f"{type(self).__name__}({fields})"
+
+
+class LatencyHistogram:
+    """
+    A histogram of how long the original iterator of a wrapper took to produce each value, for wrappers
+    created with ``latency=True`` or a ``slow_threshold``.
+
+    Durations are counted in power-of-two buckets of microseconds: bucket 0 holds durations under 1 µs and
+    bucket ``k`` those in ``[2 ** (k - 1), 2 ** k)`` µs, so recording a duration is a multiplication and a
+    ``bit_length``. A value that took at least ``slow_threshold`` seconds is also passed to ``on_slow``
+    with its index.
+
+    :param slow_threshold: The duration in seconds from which a value is slow; None if no value is.
+    :type slow_threshold: Optional[float]
+    :param on_slow: A function that is called with the index and the duration of every slow value.
+    :type on_slow: Optional[Callable[[int, float], None]]
+    """
+
+    BUCKETS = 48
+
+    def __init__(
+        self,
+        *,
+        slow_threshold: Optional[float] = None,
+        on_slow: Optional[Callable[[int, float], None]] = None,
+    ) -> None:
+        """
+        Initialize the LatencyHistogram.
+
+        :param slow_threshold: The duration in seconds from which a value is slow; None if no value is.
+        :type slow_threshold: Optional[float]
+        :param on_slow: A function that is called with the index and the duration of every slow value.
+        :type on_slow: Optional[Callable[[int, float], None]]
+
+        :raises ValueError: If slow_threshold is negative, or on_slow is given without it.
+        """
+        if slow_threshold is not None and slow_threshold < 0:
+            raise ValueError("slow_threshold must be non-negative")
+        if on_slow is not None and slow_threshold is None:
+            raise ValueError("on_slow requires slow_threshold")
+        self.slow_threshold = slow_threshold
+        self.on_slow = on_slow
+        self.counts: List[int] = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, __index: int, __duration: float, /) -> None:
+        """
+        Count the duration of the value at an index.
+
+        :param __index: The index of the value.
+        :type __index: int
+        :param __duration: The number of seconds the value took.
+        :type __duration: float
+        """
+        self.counts[min(int(__duration * 1e6).bit_length(), self.BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += __duration
+        if __duration > self.max:
+            self.max = __duration
+        if self.slow_threshold is not None and __duration >= self.slow_threshold and self.on_slow is not None:
+            self.on_slow(__index, __duration)
+
+    @property
+    def mean(self) -> float:
+        """
+        The mean duration in seconds, or 0 if nothing was recorded.
+
+        :return: The mean duration.
+        :rtype: float
+        """
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, __q: float, /) -> float:
+        """
+        Return an upper bound of a quantile of the durations: the upper edge of the bucket it falls in,
+        capped at the longest duration.
+
+        :param __q: The quantile, between 0 and 1.
+        :type __q: float
+
+        :return: The upper bound in seconds, or 0 if nothing was recorded.
+        :rtype: float
+
+        :raises ValueError: If the quantile is not between 0 and 1.
+        """
+        if not 0 <= __q <= 1:
+            raise ValueError("quantile must be between 0 and 1")
+        rank = __q * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min((1 << bucket) / 1e6, self.max)
+        return self.max
+
+    def buckets(self) -> List[Tuple[float, int]]:
+        """
+        Return the non-empty buckets as pairs of their upper edge in seconds and their count.
+
+        :return: The buckets.
+        :rtype: List[Tuple[float, int]]
+        """
+        return [((1 << bucket) / 1e6, count) for bucket, count in enumerate(self.counts) if count]
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Return the summary and the non-empty buckets by name, e.g. for a metrics exporter.
+
+        :return: The histogram.
+        :rtype: Dict[str, Any]
+        """
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.mean,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": self.buckets(),
+        }
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(count={self.count}, mean={self.mean!r}, max={self.max!r})"
+
+
+class _TimedIterator(Iterator[T]):
+    """
+    An iterator that records how long each value of another iterator took in a LatencyHistogram. Wrappers
+    pull from it instead of the original iterator, so untimed wrappers do not pay for timing at all.
+
+    :param __iterator: The original iterator.
+    :type __iterator: Iterator[T]
+    :param __histogram: The histogram to record in.
+    :type __histogram: LatencyHistogram
+    """
+
+    __slots__ = ("iterator", "histogram", "index")
+
+    def __init__(self, __iterator: Iterator[T], __histogram: LatencyHistogram, /) -> None:
+        self.iterator = __iterator
+        self.histogram = __histogram
+        self.index = 0
+
+    def __next__(self) -> T:
+        started = time.perf_counter()
+        value = next(self.iterator)
+        self.histogram.record(self.index, time.perf_counter() - started)
+        self.index += 1
+        return value
+
+
+class _TimedAsyncIterator(AsyncIterator[T]):
+    """
+    An async iterator that records how long each value of another one took in a LatencyHistogram.
+
+    :param __iterator: The original async iterator.
+    :type __iterator: AsyncIterator[T]
+    :param __histogram: The histogram to record in.
+    :type __histogram: LatencyHistogram
+    """
+
+    __slots__ = ("iterator", "histogram", "index")
+
+    def __init__(self, __iterator: AsyncIterator[T], __histogram: LatencyHistogram, /) -> None:
+        self.iterator = __iterator
+        self.histogram = __histogram
+        self.index = 0
+
+    async def __anext__(self) -> T:
+        started = time.perf_counter()
+        value = await anext(self.iterator)
+        self.histogram.record(self.index, time.perf_counter() - started)
+        self.index += 1
+        return value
+
+
+__all__ = (
+    "IteratorStats",
+    "LatencyHistogram",
+)
@@ -0,0 +1,1240 @@
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+from array import array
+from bisect import bisect_right
+from itertools import chain, islice, repeat
+from typing import (Any, Iterable, Iterator, List, Optional, Protocol,
+                    Sequence, Tuple, TypeVar, Union, overload,
+                    runtime_checkable)
+
+from .stats import _estimate_bytes
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no flock; files are then not locked.
+    fcntl = None
+
+T = TypeVar("T")
+
+_FILE_HEADER = struct.Struct("<4sB")
+_FILE_MAGIC = b"CITF"
+_FRAME = struct.Struct("<I")
+
+
+class BlockList(Sequence[T]):
+    """
+    An append-only list-like storage that keeps values in fixed-size blocks instead of one contiguous array.
+
+    Appending never reallocates the values that are already stored, so a stream of tens of millions of
+    values does not cause latency spikes or one very large allocation. Indexing is a shift and a mask, and
+    indices never change: trimming releases whole blocks from the front but keeps every index valid.
+
+    :param __iterable: The initial values.
+    :type __iterable: Iterable[T]
+    :param block_size: The number of values per block; must be a power of two.
+    :type block_size: int
+    """
+
+    def __init__(self, __iterable: Iterable[T] = (), /, *, block_size: int = 4096) -> None:
+        """
+        Initialize the BlockList.
+
+        :param __iterable: The initial values.
+        :type __iterable: Iterable[T]
+        :param block_size: The number of values per block; must be a power of two.
+        :type block_size: int
+
+        :raises ValueError: If block_size is not a positive power of two.
+        """
+        if block_size <= 0 or block_size & (block_size - 1):
+            raise ValueError("block_size must be a positive power of two")
+        self.block_size = block_size
+        self._shift = block_size.bit_length() - 1
+        self._mask = block_size - 1
+        self._tail: List[T] = []
+        self._blocks: List[Optional[List[T]]] = [self._tail]
+        self._first = 0  # Index of the first block that has not been released.
+        self._length = 0
+        for value in __iterable:
+            self.append(value)
+
+    def append(self, __value: T, /) -> None:
+        """
+        Append a value to the end of the storage.
+
+        :param __value: The value to append.
+        :type __value: T
+        """
+        tail = self._tail
+        if len(tail) == self.block_size:
+            tail = self._tail = []
+            self._blocks.append(tail)
+        tail.append(__value)
+        self._length += 1
+
+    def segment(self, __index: int, /) -> Tuple[List[T], int]:
+        """
+        Return the block that holds an index, together with the index of its first value.
+
+        :param __index: The index.
+        :type __index: int
+
+        :return: The block and the index of its first value.
+        :rtype: Tuple[List[T], int]
+
+        :raises IndexError: If the index is out of range or its block has been released.
+        """
+        position = __index >> self._shift
+        block = self._blocks[position]
+        if block is None:
+            raise IndexError("BlockList index has been released")
+        return block, position << self._shift
+
+    def trim(self, __index: int, /) -> int:
+        """
+        Release the blocks that only hold values before ``__index``. The block that is being appended to is
+        never released.
+
+        :param __index: The index of the first value that has to stay available.
+        :type __index: int
+
+        :return: The number of released values.
+        :rtype: int
+        """
+        last = min(__index >> self._shift, len(self._blocks) - 1)
+        released = 0
+        for position in range(self._first, last):
+            self._blocks[position] = None
+            released += self.block_size
+        self._first = max(self._first, last)
+        return released
+
+    def close(self) -> None:
+        """
+        Release every block; the values are no longer available.
+        """
+        self._blocks[:] = repeat(None, len(self._blocks))
+        self._first = len(self._blocks)
+
+    def __len__(self) -> int:
+        """
+        Return the number of values ever appended, including released ones.
+
+        :return: The number of values.
+        :rtype: int
+        """
+        return self._length
+
+    @overload
+    def __getitem__(self, __index: int, /) -> T: ...
+
+    @overload
+    def __getitem__(self, __index: slice, /) -> List[T]: ...
+
+    def __getitem__(self, __index: Union[int, slice], /) -> Union[T, List[T]]:
+        """
+        Return the value at an index, or a list of the values in a slice.
+
+        :param __index: The index or slice.
+        :type __index: Union[int, slice]
+
+        :return: The value or the list of values.
+        :rtype: Union[T, List[T]]
+
+        :raises IndexError: If the index is out of range or its block has been released.
+        """
+        if isinstance(__index, slice):
+            start, stop, step = __index.indices(self._length)
+            if step != 1:
+                return [self[index] for index in range(start, stop, step)]
+            return list(islice(self._iter_from(start), max(stop - start, 0)))
+        if __index < 0:
+            __index += self._length
+        if __index < 0 or __index >= self._length:
+            raise IndexError("BlockList index out of range")
+        block = self._blocks[__index >> self._shift]
+        if block is None:
+            raise IndexError("BlockList index has been released")
+        return block[__index & self._mask]
+
+    def __iter__(self) -> Iterator[T]:
+        """
+        Return an iterator over the values that have not been released.
+
+        :return: An iterator over the values.
+        :rtype: Iterator[T]
+        """
+        return chain.from_iterable(islice(self._blocks, self._first, None))
+
+    def _iter_from(self, __index: int, /) -> Iterator[T]:
+        """
+        Return an iterator over the values starting at an index, reading whole blocks at a time.
+
+        :param __index: The index of the first value.
+        :type __index: int
+
+        :return: An iterator over the values.
+        :rtype: Iterator[T]
+
+        :raises IndexError: If the first value's block has been released.
+        """
+        position = __index >> self._shift
+        if position < self._first:
+            raise IndexError("BlockList index has been released")
+        blocks = islice(self._blocks, position, None)
+        first = next(blocks, None) or []
+        return chain(islice(first, __index & self._mask, None), chain.from_iterable(blocks))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(block_size={self.block_size}, len={self._length})"
+
+
+@runtime_checkable
+class Storage(Protocol[T]):
+    """
+    The interface of the storage of a wrapper's cached values, which wrappers and their iterators are written
+    against; pass a factory of one as the ``storage`` argument of a wrapper.
+
+    Storages are append-only, and an index always refers to the same value: :meth:`trim` releases values
+    without shifting the others. Iterators read a whole :meth:`segment` with plain indexing before asking for
+    the next one, so a storage's per-value cost is that of indexing its segments.
+
+    Plain lists are the default storage; they implement the interface through the :func:`segment` and
+    :func:`release` helpers instead, which keeps their segment an exact list on the hot path.
+    """
+
+    def append(self, __value: T, /) -> None:
+        """
+        Append a value to the end of the storage.
+        """
+
+    def __len__(self) -> int:
+        """
+        Return the number of values ever appended, including released ones.
+        """
+
+    @overload
+    def __getitem__(self, __index: int, /) -> T: ...
+
+    @overload
+    def __getitem__(self, __index: slice, /) -> List[T]: ...
+
+    def __getitem__(self, __index: Union[int, slice], /) -> Union[T, List[T]]:
+        """
+        Return the value at an index, or a list of the values in a slice.
+        """
+
+    def segment(self, __index: int, /) -> Tuple[Sequence[T], int]:
+        """
+        Return a directly indexable part of the storage that holds an index, together with the index of its
+        first value.
+        """
+
+    def trim(self, __index: int, /) -> int:
+        """
+        Release values before ``__index``, as far as the storage can, and return how many were released.
+        """
+
+    def close(self) -> None:
+        """
+        Release the resources of the storage, such as files.
+        """
+
+
+class Serializer(Protocol):
+    """
+    An object that turns values into bytes and back, such as the :mod:`pickle` module.
+    """
+
+    def dumps(self, __value: Any, /) -> bytes: ...
+
+    def loads(self, __data: bytes, /) -> Any: ...
+
+
+class SpillList(Sequence[T]):
+    """
+    An append-only list-like storage that keeps at most ``max_in_memory`` values in memory and spills older
+    ones to an anonymous temporary file, reading them back transparently.
+
+    Values are spilled in batches with a single write, and read back through a memory map of the file:
+    iterators decode ``read_ahead`` values per page, so a sequential replay from disk does not cost a system
+    call per value. Like for the other storages, indices never change.
+
+    :param __iterable: The initial values.
+    :type __iterable: Iterable[T]
+    :param max_in_memory: The number of values kept in memory before the oldest ones are spilled.
+    :type max_in_memory: int
+    :param serializer: The serializer for spilled values.
+    :type serializer: Serializer
+    :param read_ahead: The number of spilled values decoded at once by sequential readers.
+    :type read_ahead: int
+    :param directory: The directory for the temporary file; the system default if None.
+    :type directory: Optional[str]
+    """
+
+    def __init__(
+        self,
+        __iterable: Iterable[T] = (),
+        /,
+        *,
+        max_in_memory: int = 65536,
+        serializer: Serializer = pickle,
+        read_ahead: int = 1024,
+        directory: Optional[str] = None,
+    ) -> None:
+        """
+        Initialize the SpillList.
+
+        :param __iterable: The initial values.
+        :type __iterable: Iterable[T]
+        :param max_in_memory: The number of values kept in memory before the oldest ones are spilled.
+        :type max_in_memory: int
+        :param serializer: The serializer for spilled values.
+        :type serializer: Serializer
+        :param read_ahead: The number of spilled values decoded at once by sequential readers.
+        :type read_ahead: int
+        :param directory: The directory for the temporary file; the system default if None.
+        :type directory: Optional[str]
+
+        :raises ValueError: If max_in_memory or read_ahead is not positive.
+        """
+        if max_in_memory <= 0:
+            raise ValueError("max_in_memory must be positive")
+        if read_ahead <= 0:
+            raise ValueError("read_ahead must be positive")
+        self.max_in_memory = max_in_memory
+        self.serializer = serializer
+        self.read_ahead = read_ahead
+        self._file = tempfile.TemporaryFile(dir=directory)
+        self._map: Optional[mmap.mmap] = None
+        self._offsets = array("Q", [0])  # Frame boundaries of the spilled values in the file.
+        self._spilled = 0
+        # The in-memory values are replaced rather than shrunk on spills, so iterators that still read from
+        # a previous list keep seeing the right values.
+        self._memory: List[T] = []
+        for value in __iterable:
+            self.append(value)
+
+    def append(self, __value: T, /) -> None:
+        """
+        Append a value to the end of the storage, spilling the oldest in-memory values if needed.
+
+        :param __value: The value to append.
+        :type __value: T
+        """
+        self._memory.append(__value)
+        if len(self._memory) > self.max_in_memory:
+            self._spill(len(self._memory) - self.max_in_memory // 2)
+
+    def _spill(self, __count: int, /) -> None:
+        """
+        Write the oldest in-memory values to the file with a single write and remap it.
+
+        :param __count: The number of values to spill.
+        :type __count: int
+        """
+        dumps = self.serializer.dumps
+        frames = [dumps(value) for value in self._memory[:__count]]
+        position = self._offsets[-1]
+        for frame in frames:
+            position += len(frame)
+            self._offsets.append(position)
+        self._file.seek(0, 2)
+        self._file.write(b"".join(frames))
+        self._file.flush()
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._memory = self._memory[__count:]
+        self._spilled += __count
+
+    def _load(self, __start: int, __stop: int, /) -> List[T]:
+        """
+        Decode the spilled values in ``[__start, __stop)``.
+
+        :param __start: The index of the first value.
+        :type __start: int
+        :param __stop: The index after the last value.
+        :type __stop: int
+
+        :return: The values.
+        :rtype: List[T]
+        """
+        loads, view, offsets = self.serializer.loads, self._map, self._offsets
+        return [loads(view[offsets[index] : offsets[index + 1]]) for index in range(__start, __stop)]
+
+    def segment(self, __index: int, /) -> Tuple[List[T], int]:
+        """
+        Return the in-memory values, or a page of decoded spilled values, starting at or holding an index,
+        together with the index of its first value.
+
+        :param __index: The index.
+        :type __index: int
+
+        :return: The segment and the index of its first value.
+        :rtype: Tuple[List[T], int]
+        """
+        spilled = self._spilled
+        if __index >= spilled:
+            return self._memory, spilled
+        return self._load(__index, min(__index + self.read_ahead, spilled)), __index
+
+    def trim(self, __index: int, /) -> int:
+        """
+        Release the in-memory values before ``__index``. Spilled values stay in the file until it is closed.
+
+        :param __index: The index of the first value that has to stay available.
+        :type __index: int
+
+        :return: The number of released values.
+        :rtype: int
+        """
+        released = min(__index, len(self)) - self._spilled
+        if released <= 0:
+            return 0
+        self._memory[:released] = repeat(None, released)
+        return released
+
+    def close(self) -> None:
+        """
+        Close and delete the temporary file.
+        """
+        self._map = None
+        self._file.close()
+
+    @property
+    def nbytes(self) -> int:
+        """
+        An estimate of the memory held by the in-memory values in bytes; spilled values are not counted.
+
+        :return: The estimated number of bytes.
+        :rtype: int
+        """
+        return _estimate_bytes(self._memory, 0)
+
+    def __len__(self) -> int:
+        """
+        Return the number of values ever appended.
+
+        :return: The number of values.
+        :rtype: int
+        """
+        return self._spilled + len(self._memory)
+
+    @overload
+    def __getitem__(self, __index: int, /) -> T: ...
+
+    @overload
+    def __getitem__(self, __index: slice, /) -> List[T]: ...
+
+    def __getitem__(self, __index: Union[int, slice], /) -> Union[T, List[T]]:
+        """
+        Return the value at an index, or a list of the values in a slice.
+
+        :param __index: The index or slice.
+        :type __index: Union[int, slice]
+
+        :return: The value or the list of values.
+        :rtype: Union[T, List[T]]
+
+        :raises IndexError: If the index is out of range.
+        """
+        length = len(self)
+        if isinstance(__index, slice):
+            start, stop, step = __index.indices(length)
+            if step != 1:
+                return [self[index] for index in range(start, stop, step)]
+            if start >= stop:
+                return []
+            spilled = self._spilled
+            values = self._load(start, min(stop, spilled)) if start < spilled else []
+            values.extend(self._memory[max(start - spilled, 0) : stop - spilled])
+            return values
+        if __index < 0:
+            __index += length
+        if __index < 0 or __index >= length:
+            raise IndexError("SpillList index out of range")
+        if __index >= self._spilled:
+            return self._memory[__index - self._spilled]
+        return self._load(__index, __index + 1)[0]
+
+    def __iter__(self) -> Iterator[T]:
+        """
+        Return an iterator over the values, reading spilled ones a page at a time.
+
+        :return: An iterator over the values.
+        :rtype: Iterator[T]
+        """
+        index = 0
+        while index < len(self):
+            values, start = self.segment(index)
+            yield from islice(values, index - start, None)
+            index = start + len(values)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(max_in_memory={self.max_in_memory}, len={len(self)})"
+
+
+def _lock(__file: Any, /) -> bool:
+    """
+    Take an exclusive lock on an open file without waiting for it.
+
+    :param __file: The file.
+    :type __file: Any
+
+    :return: Whether the lock was taken, i.e. False if another open file holds it.
+    :rtype: bool
+    """
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(__file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+class FileList(Sequence[T]):
+    """
+    An append-only list-like storage that writes every value to a file as it is appended, so that the values
+    outlive the process and can be loaded again with the same path.
+
+    The file starts with a header whose flag tells whether the values are complete, followed by one frame
+    per value: its length as a 4-byte integer and its serialized data. Opening an existing file only scans
+    the frame lengths; the values it holds are decoded lazily from a memory map of the file, ``read_ahead``
+    per page. Values appended since are kept in memory as well, in a :class:`BlockList` whose blocks
+    :meth:`trim` releases. A frame cut short by a crash is discarded.
+
+    Only one FileList writes to a file at a time: it takes an exclusive :func:`fcntl.flock` on the file when
+    it is opened and keeps it until :meth:`close`, flushing its frames before the lock is released. Another
+    FileList that opens the file meanwhile, in this process or another one, is not its :attr:`owner`: it
+    replays the file only if it is complete, and otherwise starts empty and keeps the values appended to it
+    in memory, without writing them to the file.
+
+    :param __path: The path of the file; created if it does not exist.
+    :type __path: Union[str, os.PathLike[str]]
+    :param serializer: The serializer for stored values.
+    :type serializer: Serializer
+    :param read_ahead: The number of stored values decoded at once by sequential readers.
+    :type read_ahead: int
+    """
+
+    def __init__(
+        self,
+        __path: Union[str, "os.PathLike[str]"],
+        /,
+        *,
+        serializer: Serializer = pickle,
+        read_ahead: int = 1024,
+    ) -> None:
+        """
+        Initialize the FileList, loading the frames of an existing file.
+
+        :param __path: The path of the file; created if it does not exist.
+        :type __path: Union[str, os.PathLike[str]]
+        :param serializer: The serializer for stored values.
+        :type serializer: Serializer
+        :param read_ahead: The number of stored values decoded at once by sequential readers.
+        :type read_ahead: int
+
+        :raises ValueError: If read_ahead is not positive, or the file is not a FileList.
+        """
+        if read_ahead <= 0:
+            raise ValueError("read_ahead must be positive")
+        self.path = os.fspath(__path)
+        self.serializer = serializer
+        self.read_ahead = read_ahead
+        self._file = open(self.path, "a+b")
+        self.owner = _lock(self._file)
+        self._file.seek(0)
+        header = self._file.read(_FILE_HEADER.size)
+        if not header and self.owner:
+            self._file.write(_FILE_HEADER.pack(_FILE_MAGIC, 0))
+            self._file.flush()
+            header = _FILE_HEADER.pack(_FILE_MAGIC, 0)
+        valid = len(header) == _FILE_HEADER.size and header[:4] == _FILE_MAGIC
+        # Without the lock, a short header may still be being written by the owner.
+        if not valid and (self.owner or not _FILE_MAGIC.startswith(header[:4])):
+            self._file.close()
+            raise ValueError(f"{self.path!r} is not a FileList file")
+        self.complete = valid and bool(_FILE_HEADER.unpack(header)[1])
+        self._map: Optional[mmap.mmap] = None
+        self._offsets = array("Q", [_FILE_HEADER.size])  # Frame boundaries of the stored values.
+        size = os.fstat(self._file.fileno()).st_size
+        if size > _FILE_HEADER.size and (self.owner or self.complete):
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            position = _FILE_HEADER.size
+            while position + _FRAME.size <= size:
+                end = position + _FRAME.size + _FRAME.unpack_from(self._map, position)[0]
+                if end > size:
+                    break
+                self._offsets.append(end)
+                position = end
+            if position < size and self.owner:
+                # The last frame was cut short; drop it so that appends continue after the last whole one.
+                self._map.close()
+                self._file.truncate(position)
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._stored = len(self._offsets) - 1
+        self._memory: BlockList[T] = BlockList()
+
+    @property
+    def stored(self) -> int:
+        """
+        The number of values that were in the file when it was opened; 0 for an incomplete file that another
+        FileList writes to.
+
+        :return: The number of stored values.
+        :rtype: int
+        """
+        return self._stored
+
+    def append(self, __value: T, /) -> None:
+        """
+        Append a value to the end of the storage and write it to the file, if this FileList owns it.
+
+        :param __value: The value to append.
+        :type __value: T
+        """
+        if self.owner:
+            data = self.serializer.dumps(__value)
+            self._file.write(_FRAME.pack(len(data)))
+            self._file.write(data)
+        self._memory.append(__value)
+
+    def finish(self) -> None:
+        """
+        Mark the values in the file as complete and flush it. Does nothing unless this FileList owns the file.
+        """
+        if not self.owner:
+            return
+        self._file.flush()
+        with open(self.path, "r+b") as file:
+            file.seek(4)
+            file.write(b"\x01")
+        self.complete = True
+
+    def _load(self, __start: int, __stop: int, /) -> List[T]:
+        """
+        Decode the stored values in ``[__start, __stop)``.
+
+        :param __start: The index of the first value.
+        :type __start: int
+        :param __stop: The index after the last value.
+        :type __stop: int
+
+        :return: The values.
+        :rtype: List[T]
+        """
+        loads, view, offsets = self.serializer.loads, self._map, self._offsets
+        header = _FRAME.size
+        return [loads(view[offsets[index] + header : offsets[index + 1]]) for index in range(__start, __stop)]
+
+    def segment(self, __index: int, /) -> Tuple[List[T], int]:
+        """
+        Return the block of values appended since the file was opened that holds an index, or a page of
+        decoded stored values starting at it, together with the index of its first value.
+
+        :param __index: The index.
+        :type __index: int
+
+        :return: The segment and the index of its first value.
+        :rtype: Tuple[List[T], int]
+        """
+        stored = self._stored
+        if __index >= stored:
+            block, start = self._memory.segment(__index - stored)
+            return block, stored + start
+        return self._load(__index, min(__index + self.read_ahead, stored)), __index
+
+    def trim(self, __index: int, /) -> int:
+        """
+        Release the blocks of in-memory values that only hold values before ``__index``. The file keeps every
+        value.
+
+        :param __index: The index of the first value that has to stay available.
+        :type __index: int
+
+        :return: The number of released values.
+        :rtype: int
+        """
+        if __index <= self._stored:
+            return 0
+        return self._memory.trim(__index - self._stored)
+
+    def close(self) -> None:
+        """
+        Flush and close the file, releasing its lock, and release the in-memory values.
+        """
+        self._memory.close()
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    @property
+    def nbytes(self) -> int:
+        """
+        An estimate of the memory held by the in-memory values in bytes; values stored in the file are not
+        counted.
+
+        :return: The estimated number of bytes.
+        :rtype: int
+        """
+        memory = self._memory
+        return _estimate_bytes(memory, memory._first << memory._shift)
+
+    def __len__(self) -> int:
+        """
+        Return the number of values, stored and appended.
+
+        :return: The number of values.
+        :rtype: int
+        """
+        return self._stored + len(self._memory)
+
+    @overload
+    def __getitem__(self, __index: int, /) -> T: ...
+
+    @overload
+    def __getitem__(self, __index: slice, /) -> List[T]: ...
+
+    def __getitem__(self, __index: Union[int, slice], /) -> Union[T, List[T]]:
+        """
+        Return the value at an index, or a list of the values in a slice.
+
+        :param __index: The index or slice.
+        :type __index: Union[int, slice]
+
+        :return: The value or the list of values.
+        :rtype: Union[T, List[T]]
+
+        :raises IndexError: If the index is out of range.
+        """
+        length = len(self)
+        if isinstance(__index, slice):
+            start, stop, step = __index.indices(length)
+            if step != 1:
+                return [self[index] for index in range(start, stop, step)]
+            if start >= stop:
+                return []
+            stored = self._stored
+            values = self._load(start, min(stop, stored)) if start < stored else []
+            if stop > stored:
+                values.extend(self._memory[max(start - stored, 0) : stop - stored])
+            return values
+        if __index < 0:
+            __index += length
+        if __index < 0 or __index >= length:
+            raise IndexError("FileList index out of range")
+        if __index >= self._stored:
+            return self._memory[__index - self._stored]
+        return self._load(__index, __index + 1)[0]
+
+    def __iter__(self) -> Iterator[T]:
+        """
+        Return an iterator over the values, reading stored ones a page at a time.
+
+        :return: An iterator over the values.
+        :rtype: Iterator[T]
+        """
+        index = 0
+        while index < len(self):
+            values, start = self.segment(index)
+            yield from islice(values, index - start, None)
+            index = start + len(values)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.path!r}, len={len(self)}, complete={self.complete})"
+
+
+class TypedList(Sequence[T]):
+    """
+    An append-only list-like storage that packs fixed-width values into one contiguous buffer instead of
+    keeping them as Python objects.
+
+    The format is a :mod:`struct` format string. Native single-character formats (``"q"``, ``"d"``, ...)
+    hold plain numbers and are read through a typed memoryview; other formats (``"<i"``, ``"iid"``, ...)
+    hold numbers or tuples of their fields. The buffer is a bytearray, or an anonymous memory map outside
+    of the Python heap with ``mapped=True``. It doubles in size when full; :meth:`trim` lets the next
+    growth leave the released values behind.
+
+    :meth:`view` hands out zero-copy memoryviews of cached ranges. They stay valid when the storage grows,
+    since a full buffer is replaced rather than resized.
+
+    :param __format: The struct format of one value.
+    :type __format: str
+    :param __iterable: The initial values.
+    :type __iterable: Iterable[T]
+    :param mapped: Whether to keep the buffer in an anonymous memory map.
+    :type mapped: bool
+    :param capacity: The initial number of values the buffer can hold.
+    :type capacity: int
+    """
+
+    def __init__(
+        self,
+        __format: str,
+        __iterable: Iterable[T] = (),
+        /,
+        *,
+        mapped: bool = False,
+        capacity: int = 1024,
+    ) -> None:
+        """
+        Initialize the TypedList.
+
+        :param __format: The struct format of one value.
+        :type __format: str
+        :param __iterable: The initial values.
+        :type __iterable: Iterable[T]
+        :param mapped: Whether to keep the buffer in an anonymous memory map.
+        :type mapped: bool
+        :param capacity: The initial number of values the buffer can hold.
+        :type capacity: int
+
+        :raises ValueError: If capacity is not positive.
+        :raises struct.error: If the format is invalid.
+        """
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.format = __format
+        self.mapped = mapped
+        self._struct = struct.Struct(__format)
+        self.itemsize = self._struct.size
+        self._scalar = len(self._struct.unpack(bytes(self.itemsize))) == 1
+        try:
+            memoryview(bytes(self.itemsize)).cast(__format)
+        except (TypeError, ValueError):
+            self._native = False
+        else:
+            self._native = True
+        self._base = 0  # Index of the first value in the buffer.
+        self._released = 0  # Index of the first value the next growth has to keep.
+        self._length = 0
+        self._capacity = capacity
+        self._buffer = self._allocate(capacity)
+        self._items = memoryview(self._buffer).cast(__format) if self._native else None
+        for value in __iterable:
+            self.append(value)
+
+    def _allocate(self, __capacity: int, /) -> Union[bytearray, mmap.mmap]:
+        """
+        Allocate a buffer for ``__capacity`` values.
+
+        :param __capacity: The number of values.
+        :type __capacity: int
+
+        :return: The buffer.
+        :rtype: Union[bytearray, mmap.mmap]
+        """
+        if self.mapped:
+            return mmap.mmap(-1, __capacity * self.itemsize)
+        return bytearray(__capacity * self.itemsize)
+
+    def _grow(self) -> None:
+        """
+        Replace the full buffer with one twice as large, leaving released values behind.
+        """
+        keep = max(self._released, self._base)
+        count = self._length - keep
+        self._capacity = max(self._capacity, count * 2)
+        buffer = self._allocate(self._capacity)
+        size = self.itemsize
+        buffer[: count * size] = self._buffer[(keep - self._base) * size : (self._length - self._base) * size]
+        self._buffer, self._base = buffer, keep
+        self._items = memoryview(buffer).cast(self.format) if self._native else None
+
+    def append(self, __value: T, /) -> None:
+        """
+        Append a value to the end of the storage.
+
+        :param __value: The value to append; a tuple for formats with several fields.
+        :type __value: T
+
+        :raises struct.error: If the value does not match the format.
+        """
+        position = self._length - self._base
+        if position == self._capacity:
+            self._grow()
+            position = self._length - self._base
+        if self._native:
+            self._items[position] = __value
+        elif self._scalar:
+            self._struct.pack_into(self._buffer, position * self.itemsize, __value)
+        else:
+            self._struct.pack_into(self._buffer, position * self.itemsize, *__value)
+        self._length += 1
+
+    def view(self, __start: int = 0, __stop: Optional[int] = None, /) -> memoryview:
+        """
+        Return a zero-copy view of the values in ``[__start, __stop)``. The view is typed for native formats
+        and raw bytes otherwise.
+
+        :param __start: The index of the first value.
+        :type __start: int
+        :param __stop: The index after the last value; the end of the storage if None.
+        :type __stop: Optional[int]
+
+        :return: The view.
+        :rtype: memoryview
+
+        :raises IndexError: If the range starts before the values kept in the buffer.
+        """
+        stop = self._length if __stop is None else min(__stop, self._length)
+        if __start < self._base:
+            raise IndexError("TypedList index has been released")
+        start, stop = __start - self._base, max(stop, __start) - self._base
+        if self._native:
+            return self._items[start:stop]
+        return memoryview(self._buffer)[start * self.itemsize : stop * self.itemsize]
+
+    def _decode(self, __start: int, __stop: int, /) -> List[T]:
+        """
+        Unpack the values in ``[__start, __stop)`` of a non-native format.
+
+        :param __start: The index of the first value.
+        :type __start: int
+        :param __stop: The index after the last value.
+        :type __stop: int
+
+        :return: The values.
+        :rtype: List[T]
+        """
+        values = self._struct.iter_unpack(self.view(__start, __stop))
+        if self._scalar:
+            return [value for (value,) in values]
+        return list(values)
+
+    def segment(self, __index: int, /) -> Tuple[Sequence[T], int]:
+        """
+        Return a view of the values cached so far starting at an index (or, for non-native formats, a page of
+        unpacked values), together with the index of its first value.
+
+        :param __index: The index.
+        :type __index: int
+
+        :return: The segment and the index of its first value.
+        :rtype: Tuple[Sequence[T], int]
+
+        :raises IndexError: If the index has been released.
+        """
+        if self._native:
+            return self.view(__index), __index
+        return self._decode(__index, min(__index + 1024, self._length)), __index
+
+    def trim(self, __index: int, /) -> int:
+        """
+        Let the next growth of the buffer leave the values before ``__index`` behind.
+
+        :param __index: The index of the first value that has to stay available.
+        :type __index: int
+
+        :return: The number of released values, which is always 0 as the buffer is only shrunk on growth.
+        :rtype: int
+        """
+        self._released = max(self._released, min(__index, self._length))
+        return 0
+
+    def close(self) -> None:
+        """
+        Release the buffer; the values are no longer available. A memory map stays open while views of it
+        are alive.
+        """
+        buffer, self._buffer = self._buffer, bytearray()
+        if self._items is not None:
+            self._items.release()
+        self._items = memoryview(self._buffer).cast(self.format) if self._native else None
+        self._base = self._length
+        if isinstance(buffer, mmap.mmap):
+            try:
+                buffer.close()
+            except BufferError:
+                pass
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The size of the buffer in bytes.
+
+        :return: The size of the buffer.
+        :rtype: int
+        """
+        return len(self._buffer)
+
+    def __len__(self) -> int:
+        """
+        Return the number of values ever appended.
+
+        :return: The number of values.
+        :rtype: int
+        """
+        return self._length
+
+    @overload
+    def __getitem__(self, __index: int, /) -> T: ...
+
+    @overload
+    def __getitem__(self, __index: slice, /) -> List[T]: ...
+
+    def __getitem__(self, __index: Union[int, slice], /) -> Union[T, List[T]]:
+        """
+        Return the value at an index, or a list of the values in a slice.
+
+        :param __index: The index or slice.
+        :type __index: Union[int, slice]
+
+        :return: The value or the list of values.
+        :rtype: Union[T, List[T]]
+
+        :raises IndexError: If the index is out of range or has been released.
+        """
+        if isinstance(__index, slice):
+            start, stop, step = __index.indices(self._length)
+            if step != 1:
+                return [self[index] for index in range(start, stop, step)]
+            if self._native:
+                return self.view(start, stop).tolist()
+            return self._decode(start, stop)
+        if __index < 0:
+            __index += self._length
+        if __index < 0 or __index >= self._length:
+            raise IndexError("TypedList index out of range")
+        if __index < self._base:
+            raise IndexError("TypedList index has been released")
+        if self._native:
+            return self._items[__index - self._base]
+        value = self._struct.unpack_from(self._buffer, (__index - self._base) * self.itemsize)
+        return value[0] if self._scalar else value
+
+    def __iter__(self) -> Iterator[T]:
+        """
+        Return an iterator over the values kept in the buffer.
+
+        :return: An iterator over the values.
+        :rtype: Iterator[T]
+        """
+        index = self._base
+        while index < self._length:
+            values, start = self.segment(index)
+            yield from values
+            index = start + len(values)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.format!r}, len={self._length})"
+
+
+class ChunkList(Sequence[T]):
+    """
+    An append-only list-like storage that keeps values in the chunks they were produced in, e.g. the pages of
+    a paginated API, instead of copying them one by one.
+
+    Each chunk is stored as is, together with the index of its first value, so appending a chunk costs the
+    same whatever its size, and iterators read a whole chunk before looking up the next one. The chunks must
+    not be changed after they were appended. Empty chunks are skipped, and trimming releases whole chunks
+    from the front while keeping every index valid.
+
+    :param __chunks: The initial chunks.
+    :type __chunks: Iterable[Sequence[T]]
+    """
+
+    def __init__(self, __chunks: Iterable[Sequence[T]] = (), /) -> None:
+        """
+        Initialize the ChunkList.
+
+        :param __chunks: The initial chunks.
+        :type __chunks: Iterable[Sequence[T]]
+        """
+        self._chunks: List[Optional[Sequence[T]]] = []
+        self._starts: List[int] = []
+        self._first = 0  # Index of the first chunk that has not been released.
+        self._length = 0
+        for chunk in __chunks:
+            self.append_chunk(chunk)
+
+    def append(self, __value: T, /) -> None:
+        """
+        Append a value to the end of the storage, as a chunk of its own.
+
+        :param __value: The value to append.
+        :type __value: T
+        """
+        self.append_chunk((__value,))
+
+    def append_chunk(self, __chunk: Sequence[T], /) -> None:
+        """
+        Append the values of a chunk to the end of the storage, keeping the chunk itself.
+
+        :param __chunk: The chunk to append.
+        :type __chunk: Sequence[T]
+        """
+        if not len(__chunk):
+            return
+        self._chunks.append(__chunk)
+        self._starts.append(self._length)
+        self._length += len(__chunk)
+
+    def segment(self, __index: int, /) -> Tuple[Sequence[T], int]:
+        """
+        Return the chunk that holds an index, together with the index of its first value.
+
+        :param __index: The index.
+        :type __index: int
+
+        :return: The chunk and the index of its first value.
+        :rtype: Tuple[Sequence[T], int]
+
+        :raises IndexError: If the index is out of range or its chunk has been released.
+        """
+        if __index < 0 or __index >= self._length:
+            raise IndexError("ChunkList index out of range")
+        position = bisect_right(self._starts, __index) - 1
+        chunk = self._chunks[position]
+        if chunk is None:
+            raise IndexError("ChunkList index has been released")
+        return chunk, self._starts[position]
+
+    def trim(self, __index: int, /) -> int:
+        """
+        Release the chunks that only hold values before ``__index``.
+
+        :param __index: The index of the first value that has to stay available.
+        :type __index: int
+
+        :return: The number of released values.
+        :rtype: int
+        """
+        chunks, starts = self._chunks, self._starts
+        released = 0
+        while self._first < len(chunks) and starts[self._first] + len(chunks[self._first]) <= __index:
+            released += len(chunks[self._first])
+            chunks[self._first] = None
+            self._first += 1
+        return released
+
+    def close(self) -> None:
+        """
+        Release every chunk; the values are no longer available.
+        """
+        self.trim(self._length)
+
+    @property
+    def chunk_count(self) -> int:
+        """
+        The number of chunks ever appended, including released ones.
+
+        :return: The number of chunks.
+        :rtype: int
+        """
+        return len(self._chunks)
+
+    def __len__(self) -> int:
+        """
+        Return the number of values ever appended, including released ones.
+
+        :return: The number of values.
+        :rtype: int
+        """
+        return self._length
+
+    @overload
+    def __getitem__(self, __index: int, /) -> T: ...
+
+    @overload
+    def __getitem__(self, __index: slice, /) -> List[T]: ...
+
+    def __getitem__(self, __index: Union[int, slice], /) -> Union[T, List[T]]:
+        """
+        Return the value at an index, or a list of the values in a slice.
+
+        :param __index: The index or slice.
+        :type __index: Union[int, slice]
+
+        :return: The value or the list of values.
+        :rtype: Union[T, List[T]]
+
+        :raises IndexError: If the index is out of range or its chunk has been released.
+        """
+        if isinstance(__index, slice):
+            start, stop, step = __index.indices(self._length)
+            if step != 1:
+                return [self[index] for index in range(start, stop, step)]
+            values: List[T] = []
+            while start < stop:
+                chunk, first = self.segment(start)
+                values.extend(chunk[start - first : stop - first])
+                start = first + len(chunk)
+            return values
+        if __index < 0:
+            __index += self._length
+        chunk, first = self.segment(__index)
+        return chunk[__index - first]
+
+    def __iter__(self) -> Iterator[T]:
+        """
+        Return an iterator over the values that have not been released.
+
+        :return: An iterator over the values.
+        :rtype: Iterator[T]
+        """
+        return chain.from_iterable(islice(self._chunks, self._first, None))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(chunks={len(self._chunks)}, len={self._length})"
+
+
+def segment(__values: Union[List[T], Storage[T]], __index: int, /) -> Tuple[Sequence[T], int]:
+    """
+    Return a directly indexable part of a wrapper's storage that holds an index, together with the index of
+    its first value. Iterators read from that part until they run past its end, which keeps the per-value
+    cost of a storage at one plain indexing operation.
+
+    Lists, and list-like storages that do not implement :class:`Storage`, are their own single segment.
+
+    :param __values: The storage.
+    :type __values: Union[List[T], Storage[T]]
+    :param __index: The index.
+    :type __index: int
+
+    :return: The segment and the index of its first value.
+    :rtype: Tuple[Sequence[T], int]
+    """
+    if type(__values) is not list:
+        get_segment = getattr(__values, "segment", None)
+        if get_segment is not None:
+            return get_segment(__index)
+    return __values, 0
+
+
+def release(__values: Union[List[T], Storage[T]], __start: int, __stop: int, /) -> None:
+    """
+    Release the values in ``[__start, __stop)`` of a wrapper's storage without shifting the others.
+
+    Lists get the released slots overwritten with None; other storages release through :meth:`Storage.trim`,
+    if they have it.
+
+    :param __values: The storage.
+    :type __values: Union[List[T], Storage[T]]
+    :param __start: The index of the first value to release.
+    :type __start: int
+    :param __stop: The index of the first value to keep.
+    :type __stop: int
+    """
+    if isinstance(__values, list):
+        __values[__start:__stop] = repeat(None, __stop - __start)
+        return
+    trim = getattr(__values, "trim", None)
+    if trim is not None:
+        trim(__stop)
+
+
+__all__ = (
+    "BlockList",
+    "ChunkList",
+    "FileList",
+    "Serializer",
+    "SpillList",
+    "Storage",
+    "TypedList",
+)
@@ -1,8 +1,105 @@
-from typing import Callable, Iterable, Iterator, List, ParamSpec, TypeVar
+import functools
+import hashlib
+import itertools
+import os
+import pickle
+import sys
+import threading
+import time
+import weakref
+from contextlib import nullcontext
+from queue import Empty, Full, Queue
+from types import TracebackType
+from typing import (Any, Callable, Hashable, Iterable, Iterator, List,
+                    Optional, ParamSpec, Sequence, TypeVar, Union, overload)
+from weakref import WeakSet
+
+from ._memo import Memo, make_key
+from .stats import IteratorStats, LatencyHistogram, _TimedIterator
+from .storage import (BlockList, ChunkList, FileList, Serializer, Storage,
+                      release, segment)
 
 T = TypeVar("T")
 P = ParamSpec("P")
 
+TRIM_INTERVAL = 1024
+
+_END = object()
+
+
+class _Failure:
+    """
+    An exception raised by the original iterator, passed from a prefetching thread to the consumers.
+    """
+
+    __slots__ = ("error",)
+
+    def __init__(self, __error: BaseException, /) -> None:
+        self.error = __error
+
+
+def _prefetch(__iterator: Iterator[T], __queue: "Queue[Any]", __stop: threading.Event, /) -> None:
+    """
+    Pull values from the original iterator into a bounded queue until it is exhausted or prefetching is
+    stopped. Runs in a daemon thread that holds no reference to the wrapper, so the wrapper can be collected.
+
+    :param __iterator: The original iterator.
+    :type __iterator: Iterator[T]
+    :param __queue: The queue of prefetched values; its size is the read-ahead window.
+    :type __queue: Queue[Any]
+    :param __stop: The event that is set when prefetching has to stop.
+    :type __stop: threading.Event
+    """
+    try:
+        for value in __iterator:
+            __queue.put(value)
+            if __stop.is_set():
+                return
+    except Exception as error:
+        __queue.put(_Failure(error))
+    else:
+        __queue.put(_END)
+
+
+def _slice_stop(__index: slice, /) -> Optional[int]:
+    """
+    Return how many values have to be cached to take a slice, or None if it depends on the total length.
+
+    :param __index: The slice.
+    :type __index: slice
+
+    :return: The number of values, or None.
+    :rtype: Optional[int]
+    """
+    start, stop, step = __index.start, __index.stop, __index.step
+    if (start is not None and start < 0) or (stop is not None and stop < 0):
+        return None
+    if step is not None and step < 0:
+        return None if start is None else start + 1
+    return stop
+
+
+def _stop_prefetch(__queue: "Queue[Any]", __stop: threading.Event, /) -> None:
+    """
+    Stop a prefetching thread, unblocking it if it is waiting for room in the queue.
+
+    :param __queue: The queue of prefetched values.
+    :type __queue: Queue[Any]
+    :param __stop: The event that is set when prefetching has to stop.
+    :type __stop: threading.Event
+    """
+    __stop.set()
+    while True:
+        try:
+            __queue.get_nowait()
+        except Empty:
+            break
+    try:
+        # Wake up a consumer that is waiting for the next value.
+        __queue.put_nowait(_END)
+    except Full:
+        pass
+
 
 class CacheableIteratorWrapper(Iterable[T]):
     """
@@ -12,20 +109,119 @@ class CacheableIteratorWrapper(Iterable[T]):
     This is useful for specific concurrent tasks that need to use the same iterator but cannot do so with
     standard Python means.
 
+    In thread-safe mode, pulling from the original iterator is guarded by a lock, so several threads can
+    share one wrapper. Values that are already cached are read without taking the lock.
+
+    In bounded mode, the wrapper works like :func:`itertools.tee`: it keeps weak references to its live
+    iterators and releases the cached values all of them have already passed (every ``TRIM_INTERVAL``
+    pulls, or on :meth:`trim`). New iterators start at the oldest value that is still cached.
+
+    With ``prefetch`` set, a background thread pulls up to that many values ahead of the fastest iterator,
+    so that waiting for the original iterator overlaps with the work done on the values. The thread blocks
+    while the read-ahead window is full and stops on :meth:`close` or when the wrapper is collected.
+
+    With ``stats`` set, the wrapper counts pulled and served values, iterators and the time spent waiting for
+    the original iterator in an :class:`IteratorStats`, and ``on_stats`` can export them. With ``latency`` set,
+    every value pulled from the original iterator is timed into a :class:`LatencyHistogram`, and values that
+    take at least ``slow_threshold`` seconds are passed to ``on_slow`` with their index.
+
+    If the original iterator raises an exception, the wrapper keeps it in :attr:`error`: every iterator that
+    reaches the index where it was raised gets it again, instead of a stream that silently ends there.
+
     :param __iterator: The original iterator to be wrapped.
     :type __iterator: Iterator[T]
+    :param thread_safe: Whether the wrapper may be iterated from several threads at once.
+    :type thread_safe: bool
+    :param bounded: Whether to release cached values that every live iterator has passed.
+    :type bounded: bool
+    :param storage: A factory of the storage for cached values, e.g. :class:`BlockList`; see :class:`Storage`.
+        Bounded wrappers use a :class:`BlockList` instead of the default list.
+    :type storage: Callable[[], Union[List[T], Storage[T]]]
+    :param prefetch: The number of values to read ahead in a background thread; 0 disables prefetching.
+    :type prefetch: int
+    :param stats: Whether to count the usage of the wrapper in :attr:`stats`.
+    :type stats: bool
+    :param on_stats: A function that is called with the stats as they change; implies ``stats``.
+    :type on_stats: Optional[Callable[[IteratorStats], None]]
+    :param latency: Whether to time every value of the original iterator in :attr:`latency`.
+    :type latency: bool
+    :param slow_threshold: The duration in seconds from which a value is passed to ``on_slow``; implies
+        ``latency``.
+    :type slow_threshold: Optional[float]
+    :param on_slow: A function that is called with the index and the duration of every slow value.
+    :type on_slow: Optional[Callable[[int, float], None]]
     """
 
-    def __init__(self, __iterator: Iterator[T], /) -> None:
+    def __init__(
+        self,
+        __iterator: Iterator[T],
+        /,
+        *,
+        thread_safe: bool = False,
+        bounded: bool = False,
+        storage: Callable[[], Union[List[T], Storage[T]]] = list,
+        prefetch: int = 0,
+        stats: bool = False,
+        on_stats: Optional[Callable[[IteratorStats], None]] = None,
+        latency: bool = False,
+        slow_threshold: Optional[float] = None,
+        on_slow: Optional[Callable[[int, float], None]] = None,
+    ) -> None:
         """
         Initialize the CacheableIteratorWrapper.
 
         :param __iterator: The original iterator to be wrapped.
         :type __iterator: Iterator[T]
+        :param thread_safe: Whether the wrapper may be iterated from several threads at once.
+        :type thread_safe: bool
+        :param bounded: Whether to release cached values that every live iterator has passed.
+        :type bounded: bool
+        :param storage: A factory of the storage for cached values, e.g. :class:`BlockList`; see :class:`Storage`.
+            Bounded wrappers use a :class:`BlockList` instead of the default list.
+        :type storage: Callable[[], Union[List[T], Storage[T]]]
+        :param prefetch: The number of values to read ahead in a background thread; 0 disables prefetching.
+        :type prefetch: int
+        :param stats: Whether to count the usage of the wrapper in :attr:`stats`.
+        :type stats: bool
+        :param on_stats: A function that is called with the stats as they change; implies ``stats``.
+        :type on_stats: Optional[Callable[[IteratorStats], None]]
+        :param latency: Whether to time every value of the original iterator in :attr:`latency`.
+        :type latency: bool
+        :param slow_threshold: The duration in seconds from which a value is passed to ``on_slow``; implies
+            ``latency``.
+        :type slow_threshold: Optional[float]
+        :param on_slow: A function that is called with the index and the duration of every slow value.
+        :type on_slow: Optional[Callable[[int, float], None]]
+
+        :raises ValueError: If prefetch or slow_threshold is negative.
         """
+        if prefetch < 0:
+            raise ValueError("prefetch must be non-negative")
+        self.latency: Optional[LatencyHistogram] = None
+        if latency or slow_threshold is not None or on_slow is not None:
+            self.latency = LatencyHistogram(slow_threshold=slow_threshold, on_slow=on_slow)
+            __iterator = _TimedIterator(__iterator, self.latency)
         self.iterator = __iterator
-        self.values: List[T] = []
+        if bounded and storage is list:
+            # A list cannot release its prefix without shifting indices, so bounded wrappers use blocks.
+            storage = BlockList
+        self.values: Union[List[T], Storage[T]] = storage()
         self.done: bool = False
+        self.error: Optional[Exception] = None
+        self.failed_at: Optional[float] = None
+        self._traceback: Optional[TracebackType] = None
+        self.lock: Optional[threading.Lock] = threading.Lock() if thread_safe else None
+        self.offset: int = 0
+        self.consumers: Optional[WeakSet[CacheableIterator[T]]] = WeakSet() if bounded else None
+        self.prefetch = prefetch
+        self._queue: Optional[Queue[Any]] = None
+        self._prefetcher: Optional[threading.Thread] = None
+        self._stop: Optional[weakref.finalize] = None
+        self._next_trim = TRIM_INTERVAL
+        self._store: Callable[[Any], None] = self.values.append
+        self.stats: Optional[IteratorStats] = (
+            IteratorStats(self, on_stats=on_stats) if stats or on_stats is not None else None
+        )
 
     def __iter__(self) -> Iterator[T]:
         """
@@ -34,9 +230,316 @@ class CacheableIteratorWrapper(Iterable[T]):
         :return: An iterator over the cached values.
         :rtype: Iterator[T]
         """
-        if self.done:
+        if self.done and self.error is None and self.consumers is None and self.stats is None:
             return iter(self.values)
-        return CacheableIterator(self)
+        return self._consumer()
+
+    def iter_from(self, __index: int, /) -> "CacheableIterator[T]":
+        """
+        Return an iterator that starts at an index. Values before it are not read, and the original iterator
+        is only pulled from if the index is beyond the cached values.
+
+        :param __index: The index of the first value.
+        :type __index: int
+
+        :return: An iterator over the values from the index on.
+        :rtype: CacheableIterator[T]
+
+        :raises ValueError: If the index is negative.
+        :raises IndexError: If the index has been released by a bounded wrapper.
+        """
+        return self._consumer(__index)
+
+    def _consumer(self, __start: Optional[int] = None, /) -> "CacheableIterator[T]":
+        """
+        Create an iterator over the wrapper, one that counts what it returns if the wrapper has stats.
+
+        :param __start: The index of the first value; the oldest cached value if None.
+        :type __start: Optional[int]
+
+        :return: The iterator.
+        :rtype: CacheableIterator[T]
+        """
+        if self.stats is None:
+            return CacheableIterator(self, start=__start)
+        return _CountingIterator(self, start=__start)
+
+    @property
+    def cached_len(self) -> int:
+        """
+        The number of values pulled from the original iterator so far.
+
+        :return: The number of cached values.
+        :rtype: int
+        """
+        return len(self.values)
+
+    def fill_to(self, __count: int, /) -> int:
+        """
+        Pull values from the original iterator until at least ``__count`` values are cached or it is exhausted.
+
+        :param __count: The number of values that should be cached.
+        :type __count: int
+
+        :return: The number of cached values.
+        :rtype: int
+        """
+        if len(self.values) < __count:
+            self._fill(__count)
+        return len(self.values)
+
+    @overload
+    def __getitem__(self, __index: int, /) -> T: ...
+
+    @overload
+    def __getitem__(self, __index: slice, /) -> List[T]: ...
+
+    def __getitem__(self, __index: Union[int, slice], /) -> Union[T, List[T]]:
+        """
+        Return the value at an index, or a list of the values in a slice, pulling from the original iterator
+        only as far as needed. Negative indices pull until it is exhausted.
+
+        :param __index: The index or slice.
+        :type __index: Union[int, slice]
+
+        :return: The value or the list of values.
+        :rtype: Union[T, List[T]]
+
+        :raises IndexError: If the index is out of range or has been released by a bounded wrapper.
+        """
+        if isinstance(__index, slice):
+            stop = _slice_stop(__index)
+            self.fill_to(sys.maxsize if stop is None else stop)
+            indices = range(*__index.indices(len(self.values)))
+            if indices and min(indices[0], indices[-1]) < self.offset:
+                raise IndexError("CacheableIteratorWrapper index has been released")
+            return self.values[__index]
+        self.fill_to(sys.maxsize if __index < 0 else __index + 1)
+        if __index < 0:
+            __index += len(self.values)
+        if __index < 0 or __index >= len(self.values):
+            raise IndexError("CacheableIteratorWrapper index out of range")
+        if __index < self.offset:
+            raise IndexError("CacheableIteratorWrapper index has been released")
+        return self.values[__index]
+
+    def trim(self) -> int:
+        """
+        Release the cached values that every live iterator has already passed. Does nothing unless the
+        wrapper is bounded.
+
+        :return: The number of released values.
+        :rtype: int
+        """
+        if self.consumers is None:
+            return 0
+        if self.lock is None:
+            return self._trim()
+        with self.lock:
+            return self._trim()
+
+    def _trim(self) -> int:
+        """
+        Release the cached values behind the slowest live iterator; the caller holds the lock.
+
+        :return: The number of released values.
+        :rtype: int
+        """
+        # Released values are not deleted from the storage, so that the indices of cached values never
+        # change under iterators that read them without the lock.
+        low = min((consumer.index for consumer in self.consumers), default=len(self.values))
+        low = min(low, len(self.values))
+        released = low - self.offset
+        if released <= 0:
+            return 0
+        release(self.values, self.offset, low)
+        self.offset = low
+        return released
+
+    def _place(self, __consumer: "CacheableIterator[T]", __index: Optional[int], /) -> None:
+        """
+        Position an iterator at an index, or at the oldest value that is still cached if None. Iterators of a
+        bounded wrapper are tracked from then on.
+
+        :param __consumer: The iterator to position.
+        :type __consumer: CacheableIterator[T]
+        :param __index: The index of the next value the iterator returns.
+        :type __index: Optional[int]
+
+        :raises ValueError: If the index is negative.
+        :raises IndexError: If the index has been released by a bounded wrapper.
+        """
+        if __index is not None and __index < 0:
+            raise ValueError("index must be non-negative")
+        with self.lock or nullcontext():
+            index = self.offset if __index is None else __index
+            if index < self.offset:
+                raise IndexError("CacheableIteratorWrapper index has been released")
+            __consumer.index = index
+            __consumer._segment, __consumer._start = (), index
+            if self.consumers is not None:
+                self.consumers.add(__consumer)
+
+    def _fill(self, __count: int, /) -> bool:
+        """
+        Pull values from the original iterator until at least ``__count`` values are cached.
+
+        :param __count: The number of values that should be cached.
+        :type __count: int
+
+        :return: Whether that many values are cached.
+        :rtype: bool
+
+        :raises Exception: The error of the original iterator, if it raised one before that many values.
+        """
+        if self.lock is None:
+            return self._pull(__count)
+        with self.lock:
+            # Another thread may have pulled the values while this one was waiting for the lock.
+            return self._pull(__count)
+
+    def _pull(self, __count: int, /) -> bool:
+        """
+        Pull values from the original iterator until at least ``__count`` values are cached; the caller
+        holds the lock.
+
+        :param __count: The number of values that should be cached.
+        :type __count: int
+
+        :return: Whether that many values are cached.
+        :rtype: bool
+
+        :raises Exception: The error of the original iterator, if it raised one before that many values.
+        """
+        values, stats = self.values, self.stats
+        while len(values) < __count:
+            if self.done:
+                if self.error is not None:
+                    raise self.error.with_traceback(self._traceback)
+                return False
+            try:
+                advanced = self._advance() if stats is None else self._timed_advance(stats)
+            except Exception as error:
+                self._fail(error)
+                raise
+            if not advanced:
+                self.done = True
+                return False
+            if self.consumers is not None and len(values) >= self._next_trim:
+                self._trim()
+                self._next_trim = len(values) + TRIM_INTERVAL
+        return True
+
+    def _fail(self, __error: Exception, /) -> None:
+        """
+        Keep the error the original iterator raised, so that it is raised again at the same index instead of
+        pulling from an iterator that is dead; the caller holds the lock.
+
+        :param __error: The error.
+        :type __error: Exception
+        """
+        self.error = __error
+        self.failed_at = time.monotonic()
+        self._traceback = __error.__traceback__
+        self.done = True
+
+    def _advance(self) -> bool:
+        """
+        Cache at least one more value; the caller holds the lock.
+
+        :return: Whether a value was cached, i.e. False if the original iterator is exhausted.
+        :rtype: bool
+        """
+        if self.prefetch:
+            return self._receive()
+        try:
+            value = next(self.iterator)
+        except StopIteration:
+            return False
+        self._store(value)
+        return True
+
+    def _timed_advance(self, __stats: IteratorStats, /) -> bool:
+        """
+        Cache at least one more value and record the pull in the stats, reporting them once the original
+        iterator is exhausted; the caller holds the lock.
+
+        :param __stats: The stats of the wrapper.
+        :type __stats: IteratorStats
+
+        :return: Whether a value was cached, i.e. False if the original iterator is exhausted.
+        :rtype: bool
+        """
+        started = time.perf_counter()
+        advanced = self._advance()
+        values = self.values
+        __stats._add_pull(len(values), len(values) - self.offset, time.perf_counter() - started)
+        if self.done or not advanced:
+            __stats.report()
+        return advanced
+
+    def _receive(self) -> bool:
+        """
+        Cache every value the prefetching thread has read ahead, waiting for at least one; the caller holds
+        the lock. Starts the thread on first use.
+
+        :return: Whether a value was cached, i.e. False if the original iterator is exhausted.
+        :rtype: bool
+        """
+        if self._queue is None:
+            self._queue = Queue(self.prefetch)
+            stop = threading.Event()
+            self._stop = weakref.finalize(self, _stop_prefetch, self._queue, stop)
+            self._prefetcher = threading.Thread(
+                target=_prefetch, args=(self.iterator, self._queue, stop), daemon=True
+            )
+            self._prefetcher.start()
+        elif not self._stop.alive:
+            return False
+
+        queue, store = self._queue, self._store
+        item = queue.get()
+        received = False
+        while True:
+            if item is _END:
+                self.done = True
+                return received
+            if isinstance(item, _Failure):
+                # Like a failing original iterator without prefetching: the values read ahead before the
+                # error are cached, and _pull raises the error once they are passed.
+                if not received:
+                    raise item.error
+                self._fail(item.error)
+                return True
+            store(item)
+            received = True
+            try:
+                item = queue.get_nowait()
+            except Empty:
+                return True
+
+    def close(self, *, release: bool = False) -> None:
+        """
+        Stop prefetching. Values cached so far stay available, but no new ones are pulled, unless the storage
+        is released as well.
+
+        :param release: Whether to also close the storage, e.g. the file of a :class:`FileList` or the
+            temporary file of a :class:`SpillList`, after which the cached values are no longer available.
+        :type release: bool
+        """
+        if self._stop is not None:
+            self._stop()
+        self.done = True
+        if self.stats is not None:
+            self.stats.report()
+        if release and not isinstance(self.values, list):
+            self.values.close()
+
+    def __enter__(self) -> "CacheableIteratorWrapper[T]":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close(release=True)
 
 
 class CacheableIterator(Iterator[T]):
@@ -47,15 +550,73 @@ class CacheableIterator(Iterator[T]):
     :type __wrapper: CacheableIteratorWrapper
     """
 
-    def __init__(self, __wrapper: CacheableIteratorWrapper, /):
+    def __init__(self, __wrapper: CacheableIteratorWrapper, /, *, start: Optional[int] = None):
         """
         Initialize the CacheableIterator.
 
         :param __wrapper: The CacheableIteratorWrapper instance to iterate over.
         :type __wrapper: CacheableIteratorWrapper
+        :param start: The index of the first value; the oldest cached value if None.
+        :type start: Optional[int]
+
+        :raises ValueError: If start is negative.
+        :raises IndexError: If start has been released by a bounded wrapper.
         """
         self.wrapper = __wrapper
         self.index = 0
+        self._segment: Sequence[T] = ()
+        self._start = 0
+        if start or __wrapper.consumers is not None:
+            __wrapper._place(self, start)
+
+    def seek(self, __index: int, /) -> None:
+        """
+        Move the iterator, so that the next value it returns is the one at an index.
+
+        :param __index: The index.
+        :type __index: int
+
+        :raises ValueError: If the index is negative.
+        :raises IndexError: If the index has been released by a bounded wrapper.
+        """
+        self.wrapper._place(self, __index)
+
+    def next_n(self, __count: int, /) -> List[T]:
+        """
+        Return up to ``__count`` next values at once. Cached values are sliced from the storage, and missing
+        ones are pulled from the original iterator in one go.
+
+        :param __count: The maximum number of values.
+        :type __count: int
+
+        :return: The values; fewer than ``__count`` at the end of the iterator, and none after it.
+        :rtype: List[T]
+
+        :raises Exception: The error of the original iterator, once no value before it is left.
+        """
+        stop = self.index + max(__count, 0)
+        if stop > len(self.wrapper.values):
+            try:
+                self.wrapper._fill(stop)
+            except Exception:
+                # The values before the error are returned first; the next call raises it.
+                if self.index >= len(self.wrapper.values):
+                    raise
+        stop = min(stop, len(self.wrapper.values))
+        if stop <= self.index:
+            return []
+        values = self.wrapper.values[self.index : stop]
+        self.index = stop
+        return values
+
+    def tell(self) -> int:
+        """
+        Return the index of the next value the iterator returns.
+
+        :return: The index.
+        :rtype: int
+        """
+        return self.index
 
     def __next__(self) -> T:
         """
@@ -65,50 +626,466 @@ class CacheableIterator(Iterator[T]):
         :rtype: T
 
         :raises StopIteration: If the end of the iterator is reached.
+        :raises Exception: The error of the original iterator, at the index where it was raised.
         """
-        if self.index < len(self.wrapper.values):
-            value = self.wrapper.values[self.index]
-        else:
-            try:
-                value = next(self.wrapper.iterator)
-            except StopIteration:
-                self.wrapper.__done = True
+        position = self.index - self._start
+        if position >= len(self._segment):
+            if self.index >= len(self.wrapper.values) and not self.wrapper._fill(self.index + 1):
                 raise StopIteration()
-            else:
-                self.wrapper.values.append(value)
+            if position >= len(self._segment):
+                self._segment, self._start = segment(self.wrapper.values, self.index)
+                position = self.index - self._start
 
+        value = self._segment[position]
         self.index += 1
 
         return value
 
 
-def cacheable_iterator(__func: Callable[P, Iterator[T]], /) -> Callable[P, Iterable[T]]:
+class _CountingIterator(CacheableIterator[T]):
+    """
+    A CacheableIterator that counts the values it returns in the stats of its wrapper.
+
+    :param __wrapper: The CacheableIteratorWrapper instance to iterate over.
+    :type __wrapper: CacheableIteratorWrapper
+    """
+
+    def __init__(self, __wrapper: CacheableIteratorWrapper, /, *, start: Optional[int] = None):
+        """
+        Initialize the _CountingIterator.
+
+        :param __wrapper: The CacheableIteratorWrapper instance to iterate over.
+        :type __wrapper: CacheableIteratorWrapper
+        :param start: The index of the first value; the oldest cached value if None.
+        :type start: Optional[int]
+        """
+        super().__init__(__wrapper, start=start)
+        __wrapper.stats._add_consumer(self)
+
+    def next_n(self, __count: int, /) -> List[T]:
+        """
+        Return up to ``__count`` next values at once, counting them.
+
+        :param __count: The maximum number of values.
+        :type __count: int
+
+        :return: The values; fewer than ``__count`` at the end of the iterator, and none after it.
+        :rtype: List[T]
+        """
+        cached = len(self.wrapper.values) - self.index
+        values = super().next_n(__count)
+        stats = self.wrapper.stats
+        stats.served += len(values)
+        stats.served_from_cache += min(max(cached, 0), len(values))
+        return values
+
+    def __next__(self) -> T:
+        """
+        Return the next value from the iterator, counting it.
+
+        :return: The next value from the iterator.
+        :rtype: T
+
+        :raises StopIteration: If the end of the iterator is reached.
+        """
+        cached = self.index < len(self.wrapper.values)
+        value = super().__next__()
+        stats = self.wrapper.stats
+        stats.served += 1
+        if cached:
+            stats.served_from_cache += 1
+        return value
+
+
+class CacheableChunkedIteratorWrapper(CacheableIteratorWrapper[T]):
+    """
+    A CacheableIteratorWrapper for an original iterator that produces chunks of values, such as the pages of
+    a paginated API.
+
+    The chunks are cached as they are in a :class:`ChunkList`, so the values are not copied or yielded one by
+    one while they are pulled. Iterating over the wrapper still produces single values, and :meth:`chunks`
+    produces them a chunk at a time for consumers that work in batches. Indices, slices and lengths count
+    single values, except that ``latency`` times whole chunks and passes chunk indices to ``on_slow``.
+
+    :param __iterator: The original iterator of chunks to be wrapped.
+    :type __iterator: Iterator[Sequence[T]]
+    :param thread_safe: Whether the wrapper may be iterated from several threads at once.
+    :type thread_safe: bool
+    :param bounded: Whether to release cached chunks that every live iterator has passed.
+    :type bounded: bool
+    :param prefetch: The number of chunks to read ahead in a background thread; 0 disables prefetching.
+    :type prefetch: int
+    :param stats: Whether to count the usage of the wrapper in :attr:`stats`.
+    :type stats: bool
+    :param on_stats: A function that is called with the stats as they change; implies ``stats``.
+    :type on_stats: Optional[Callable[[IteratorStats], None]]
+    :param latency: Whether to time every value of the original iterator in :attr:`latency`.
+    :type latency: bool
+    :param slow_threshold: The duration in seconds from which a value is passed to ``on_slow``; implies
+        ``latency``.
+    :type slow_threshold: Optional[float]
+    :param on_slow: A function that is called with the index and the duration of every slow value.
+    :type on_slow: Optional[Callable[[int, float], None]]
+    """
+
+    def __init__(
+        self,
+        __iterator: Iterator[Sequence[T]],
+        /,
+        *,
+        thread_safe: bool = False,
+        bounded: bool = False,
+        prefetch: int = 0,
+        stats: bool = False,
+        on_stats: Optional[Callable[[IteratorStats], None]] = None,
+        latency: bool = False,
+        slow_threshold: Optional[float] = None,
+        on_slow: Optional[Callable[[int, float], None]] = None,
+    ) -> None:
+        """
+        Initialize the CacheableChunkedIteratorWrapper.
+
+        :param __iterator: The original iterator of chunks to be wrapped.
+        :type __iterator: Iterator[Sequence[T]]
+        :param thread_safe: Whether the wrapper may be iterated from several threads at once.
+        :type thread_safe: bool
+        :param bounded: Whether to release cached chunks that every live iterator has passed.
+        :type bounded: bool
+        :param prefetch: The number of chunks to read ahead in a background thread; 0 disables prefetching.
+        :type prefetch: int
+        :param stats: Whether to count the usage of the wrapper in :attr:`stats`.
+        :type stats: bool
+        :param on_stats: A function that is called with the stats as they change; implies ``stats``.
+        :type on_stats: Optional[Callable[[IteratorStats], None]]
+        :param latency: Whether to time every value of the original iterator in :attr:`latency`.
+        :type latency: bool
+        :param slow_threshold: The duration in seconds from which a value is passed to ``on_slow``; implies
+            ``latency``.
+        :type slow_threshold: Optional[float]
+        :param on_slow: A function that is called with the index and the duration of every slow value.
+        :type on_slow: Optional[Callable[[int, float], None]]
+
+        :raises ValueError: If prefetch or slow_threshold is negative.
+        """
+        super().__init__(
+            __iterator,  # type: ignore[arg-type]
+            thread_safe=thread_safe,
+            bounded=bounded,
+            storage=ChunkList,
+            prefetch=prefetch,
+            stats=stats,
+            on_stats=on_stats,
+            latency=latency,
+            slow_threshold=slow_threshold,
+            on_slow=on_slow,
+        )
+        self.values: ChunkList[T]
+        self._store = self.values.append_chunk
+
+    def chunks(self) -> Iterator[Sequence[T]]:
+        """
+        Return an iterator over the cached values a chunk at a time. It starts where a new iterator over single
+        values would, and a chunk it starts in the middle of is cut at that point.
+
+        :return: An iterator over the chunks.
+        :rtype: Iterator[Sequence[T]]
+        """
+        return self._chunks(self._consumer())
+
+    def _chunks(self, __consumer: CacheableIterator[T], /) -> Iterator[Sequence[T]]:
+        """
+        Produce the chunks from the position of an iterator on, moving it past every chunk produced. The
+        iterator keeps the chunks from being released by a bounded wrapper.
+
+        :param __consumer: The iterator.
+        :type __consumer: CacheableIterator[T]
+
+        :return: An iterator over the chunks.
+        :rtype: Iterator[Sequence[T]]
+        """
+        values, stats = self.values, self.stats
+        while True:
+            cached = __consumer.index < len(values)
+            if not cached and not self._fill(__consumer.index + 1):
+                return
+            chunk, start = values.segment(__consumer.index)
+            position = __consumer.index - start
+            __consumer.index = start + len(chunk)
+            if position:
+                chunk = chunk[position:]
+            if stats is not None:
+                stats.served += len(chunk)
+                if cached:
+                    stats.served_from_cache += len(chunk)
+            yield chunk
+
+
+class _Resume(Iterator[T]):
+    """
+    An iterator that creates the original iterator on first use and skips the values a file already holds.
+    It records how many values the original iterator produced in total once it is exhausted.
+
+    :param __factory: The function that creates the original iterator.
+    :type __factory: Callable[[], Iterator[T]]
+    :param __skip: The number of values to skip.
+    :type __skip: int
+    """
+
+    __slots__ = ("factory", "skip", "iterator", "produced", "total")
+
+    def __init__(self, __factory: Callable[[], Iterator[T]], __skip: int, /) -> None:
+        self.factory = __factory
+        self.skip = __skip
+        self.iterator: Optional[Iterator[T]] = None
+        self.produced = __skip
+        self.total: Optional[int] = None
+
+    def __next__(self) -> T:
+        if self.iterator is None:
+            self.iterator = itertools.islice(self.factory(), self.skip, None)
+        try:
+            value = next(self.iterator)
+        except StopIteration:
+            self.total = self.produced
+            raise
+        self.produced += 1
+        return value
+
+
+class PersistentIteratorWrapper(CacheableIteratorWrapper[T]):
+    """
+    A CacheableIteratorWrapper that caches into a :class:`FileList`, so that its values survive the process.
+
+    A file that is complete is replayed without creating the original iterator at all. A file that holds only
+    part of the values, e.g. because the process stopped before the original iterator was exhausted, is
+    resumed: its values are served first, and the original iterator is created when more are needed, with the
+    values the file already holds skipped. This assumes that the original iterator produces the same values
+    every time. The file is marked as complete once every value is in it.
+
+    Only the wrapper whose :class:`FileList` owns the file writes to it. A wrapper that opens the file while
+    another one holds it starts from the beginning unless the file is complete, and caches in memory only.
+
+    :param __factory: The function that creates the original iterator.
+    :type __factory: Callable[[], Iterator[T]]
+    :param __path: The path of the file.
+    :type __path: Union[str, os.PathLike[str]]
+    :param serializer: The serializer for stored values.
+    :type serializer: Serializer
+    :param options: Other keyword arguments of CacheableIteratorWrapper, except ``storage``.
+    """
+
+    def __init__(
+        self,
+        __factory: Callable[[], Iterator[T]],
+        __path: Union[str, "os.PathLike[str]"],
+        /,
+        *,
+        serializer: Serializer = pickle,
+        **options: Any,
+    ) -> None:
+        """
+        Initialize the PersistentIteratorWrapper, loading the file if it exists.
+
+        :param __factory: The function that creates the original iterator.
+        :type __factory: Callable[[], Iterator[T]]
+        :param __path: The path of the file.
+        :type __path: Union[str, os.PathLike[str]]
+        :param serializer: The serializer for stored values.
+        :type serializer: Serializer
+        :param options: Other keyword arguments of CacheableIteratorWrapper, except ``storage``.
+
+        :raises ValueError: If the file exists but is not a FileList file.
+        """
+        values: FileList[T] = FileList(__path, serializer=serializer)
+        self._source: _Resume[T] = _Resume(__factory, values.stored)
+        super().__init__(self._source, storage=lambda: values, **options)
+        self.values: FileList[T]
+        self.done = values.complete
+
+    def _pull(self, __count: int, /) -> bool:
+        pulled = super()._pull(__count)
+        if not pulled and self._source.total == len(self.values) and not self.values.complete:
+            self.values.finish()
+        return pulled
+
+
+def _failed_for(__error_ttl: Optional[float], /) -> Optional[Callable[[Any], bool]]:
+    """
+    Return a predicate of memoized wrappers whose original iterator raised an error at least ``__error_ttl``
+    seconds ago.
+
+    :param __error_ttl: The number of seconds a failed wrapper is reused for; None to not expire them early.
+    :type __error_ttl: Optional[float]
+
+    :return: The predicate, or None.
+    :rtype: Optional[Callable[[Any], bool]]
+
+    :raises ValueError: If the number of seconds is negative.
+    """
+    if __error_ttl is None:
+        return None
+    if __error_ttl < 0:
+        raise ValueError("error_ttl must be non-negative")
+
+    def expired(wrapper: Any) -> bool:
+        failed_at = wrapper.failed_at
+        return failed_at is not None and time.monotonic() - failed_at >= __error_ttl
+
+    return expired
+
+
+def _persistent_path(
+    __directory: Union[str, "os.PathLike[str]"], __func: Callable[..., Any], __key: Hashable, /
+) -> str:
+    """
+    Return the path of the file that persists the values of a call, named after a hash of the qualified name
+    of the function and the memoization key of the call.
+
+    :param __directory: The directory of the files.
+    :type __directory: Union[str, os.PathLike[str]]
+    :param __func: The decorated function.
+    :type __func: Callable[..., Any]
+    :param __key: The memoization key of the call; it has to be picklable.
+    :type __key: Hashable
+
+    :return: The path of the file.
+    :rtype: str
+    """
+    name = pickle.dumps((__func.__module__, __func.__qualname__, __key), protocol=4)
+    return os.path.join(__directory, hashlib.sha256(name).hexdigest()[:32] + ".cit")
+
+
+@overload
+def cacheable_iterator(__func: Callable[P, Iterator[T]], /) -> Callable[P, Iterable[T]]: ...
+
+
+@overload
+def cacheable_iterator(
+    *,
+    memoize: bool = False,
+    key: Optional[Callable[..., Hashable]] = None,
+    maxsize: Optional[int] = 128,
+    ttl: Optional[float] = None,
+    error_ttl: Optional[float] = None,
+    persist: Union[str, "os.PathLike[str]", None] = None,
+    **options: Any,
+) -> Callable[[Callable[P, Iterator[T]]], Callable[P, Iterable[T]]]: ...
+
+
+def cacheable_iterator(
+    __func: Optional[Callable[P, Iterator[T]]] = None,
+    /,
+    *,
+    memoize: bool = False,
+    key: Optional[Callable[..., Hashable]] = None,
+    maxsize: Optional[int] = 128,
+    ttl: Optional[float] = None,
+    error_ttl: Optional[float] = None,
+    persist: Union[str, "os.PathLike[str]", None] = None,
+    **options: Any,
+) -> Any:
     """
     Decorator function to convert an iterator-returning function into one that returns a CacheableIteratorWrapper.
 
+    Can be used bare or with arguments. With ``memoize=True``, calls with the same arguments share one
+    wrapper, so the original function only runs once per key while its wrapper is alive in the LRU memo.
+    A memoized wrapper whose original iterator raised an error replays it to every call; with ``error_ttl``,
+    it is replaced that many seconds after the error, so a failing upstream is retried at most that often.
+    The decorated function gets a ``cache_clear()`` method.
+
+    With ``persist`` set to a directory, every call caches into a file there, named after the qualified name
+    of the function and the memoization key, with a :class:`PersistentIteratorWrapper`. Later calls with the
+    same key, also in later processes, replay a complete file without calling the function, and resume an
+    incomplete one. Calls in one process share the wrapper of a file while it is alive.
+
     :param __func: The function that returns an iterator.
     :type __func: Callable[P, Iterator[T]]
+    :param memoize: Whether to share wrappers between calls with the same arguments.
+    :type memoize: bool
+    :param key: A function of the call arguments that returns the memoization key; by default, the positional
+        arguments and the keyword arguments in any order.
+    :type key: Optional[Callable[..., Hashable]]
+    :param maxsize: The maximum number of memoized wrappers; unbounded if None.
+    :type maxsize: Optional[int]
+    :param ttl: The number of seconds a memoized wrapper is reused for; unlimited if None.
+    :type ttl: Optional[float]
+    :param error_ttl: The number of seconds a memoized wrapper whose original iterator raised an error is
+        reused for after the error; as long as ``ttl`` if None. Requires ``memoize``.
+    :type error_ttl: Optional[float]
+    :param persist: The directory to persist the values of every call in, created on the first call if it is
+        missing; nothing is persisted if None. The memoization keys have to be picklable.
+    :type persist: Union[str, os.PathLike[str], None]
+    :param options: Keyword arguments for every CacheableIteratorWrapper, e.g. ``thread_safe=True``. A
+        memoized or persisted wrapper cannot be ``bounded``, since later calls replay it from the start.
 
-    :return: A new function that returns a CacheableIteratorWrapper.
+    :return: A new function that returns a CacheableIteratorWrapper, or a decorator if ``__func`` is None.
     :rtype: Callable[P, Iterable[T]]
+
+    :raises ValueError: If error_ttl is negative or given without memoize, or memoize or persist is combined
+        with bounded.
     """
+    if memoize and options.get("bounded"):
+        raise ValueError("memoized wrappers cannot be bounded, since later calls replay them from the start")
+    if error_ttl is not None and not memoize:
+        raise ValueError("error_ttl only applies to memoized wrappers")
+    expired = _failed_for(error_ttl)
+    if persist is not None and options.get("bounded"):
+        raise ValueError("persisted wrappers cannot be bounded, since later calls replay them from the start")
 
-    def inner(*args: P.args, **kwargs: P.kwargs) -> Iterable[T]:
-        """
-        Create a CacheableIteratorWrapper from the original function.
+    def decorator(__func: Callable[P, Iterator[T]], /) -> Callable[P, Iterable[T]]:
+        memo: Optional[Memo[CacheableIteratorWrapper[T]]] = (
+            Memo(maxsize=maxsize, ttl=ttl, expired=expired) if memoize else None
+        )
+        files: "weakref.WeakValueDictionary[str, PersistentIteratorWrapper[T]]" = weakref.WeakValueDictionary()
+        files_lock = threading.Lock()
 
-        :param args: Positional arguments to pass to the original function.
-        :param kwargs: Keyword arguments to pass to the original function.
+        def create(args: Any, kwargs: Any) -> CacheableIteratorWrapper[T]:
+            if persist is None:
+                return CacheableIteratorWrapper(__func(*args, **kwargs), **options)
+            call = (args, tuple(sorted(kwargs.items()))) if key is None else key(*args, **kwargs)
+            path = _persistent_path(persist, __func, call)
+            with files_lock:
+                wrapper = files.get(path)
+                if wrapper is None:
+                    os.makedirs(persist, exist_ok=True)
+                    wrapper = files[path] = PersistentIteratorWrapper(
+                        lambda: __func(*args, **kwargs), path, **options
+                    )
+                return wrapper
 
-        :return: A CacheableIteratorWrapper instance.
-        :rtype: Iterable[T]
-        """
-        return CacheableIteratorWrapper(__func(*args, **kwargs))
+        @functools.wraps(__func)
+        def inner(*args: P.args, **kwargs: P.kwargs) -> Iterable[T]:
+            """
+            Create a CacheableIteratorWrapper from the original function, or return the memoized one.
+
+            :param args: Positional arguments to pass to the original function.
+            :param kwargs: Keyword arguments to pass to the original function.
+
+            :return: A CacheableIteratorWrapper instance.
+            :rtype: Iterable[T]
+            """
+            if memo is None:
+                return create(args, kwargs)
+            return memo.get_or_create(
+                make_key(args, kwargs) if key is None else key(*args, **kwargs),
+                lambda: create(args, kwargs),
+            )
+
+        def cache_clear() -> None:
+            if memo is not None:
+                memo.clear()
+
+        inner.cache_clear = cache_clear  # type: ignore[attr-defined]
+        return inner
 
-    return inner
+    if __func is None:
+        return decorator
+    return decorator(__func)
 
 
 __all__ = (
+    "CacheableChunkedIteratorWrapper",
     "CacheableIteratorWrapper",
+    "PersistentIteratorWrapper",
     "cacheable_iterator",
 )
@@ -1,8 +1,12 @@
 import asyncio
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
 
-from cached_iterators import CacheableAsyncIteratorWrapper, cacheable_async_iterator
+from cached_iterators import (AsyncIteratorWrapper, CacheableAsyncIteratorWrapper,
+                              CacheableChunkedAsyncIteratorWrapper, cacheable_async_iterator)
 
 
 async def async_generate_numbers():
@@ -42,3 +46,447 @@ async def test_cacheable_async_iterator_decorator():
     assert second_pass == [0, 1, 2, 3, 4]
 
     assert first_pass == second_pass
+
+
+@pytest.mark.asyncio
+async def test_cacheable_async_iterator_concurrent_consumers():
+    pulled = []
+
+    async def slow_generate_numbers():
+        for i in range(5):
+            await asyncio.sleep(0)
+            pulled.append(i)
+            yield i
+
+    cached_iter = CacheableAsyncIteratorWrapper(slow_generate_numbers())
+
+    async def consume():
+        return [num async for num in cached_iter]
+
+    results = await asyncio.gather(*(consume() for _ in range(10)))
+    assert results == [[0, 1, 2, 3, 4]] * 10
+    assert pulled == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.asyncio
+async def test_cacheable_async_iterator_wrapper_done():
+    cached_iter = CacheableAsyncIteratorWrapper(async_generate_numbers())
+    assert not cached_iter.done
+
+    [num async for num in cached_iter]
+    assert cached_iter.done
+    assert isinstance(cached_iter.__aiter__(), AsyncIteratorWrapper)
+    assert [num async for num in cached_iter] == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.asyncio
+async def test_async_iterator_wrapper_yield_every():
+    switches = 0
+
+    async def count_switches():
+        nonlocal switches
+        while True:
+            await asyncio.sleep(0)
+            switches += 1
+
+    counter = asyncio.create_task(count_switches())
+    await asyncio.sleep(0)
+
+    values = [num async for num in AsyncIteratorWrapper(iter(range(100)), yield_every=10)]
+    counter.cancel()
+
+    assert values == list(range(100))
+    assert switches == 10
+
+    with pytest.raises(ValueError):
+        AsyncIteratorWrapper(iter(()), yield_every=-1)
+
+
+@pytest.mark.asyncio
+async def test_offloaded_iterator():
+    loop_thread = threading.get_ident()
+    threads = set()
+    calls = 0
+
+    def blocking_numbers():
+        nonlocal calls
+        for i in range(100):
+            calls += 1
+            threads.add(threading.get_ident())
+            yield i
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        cached_iter = CacheableAsyncIteratorWrapper.from_iterator(
+            blocking_numbers(), executor=executor, batch_size=32
+        )
+
+        async def consume():
+            return [num async for num in cached_iter]
+
+        results = await asyncio.gather(*(consume() for _ in range(4)))
+
+    assert results == [list(range(100))] * 4
+    assert calls == 100
+    assert loop_thread not in threads
+
+    def failing_numbers():
+        yield 1
+        yield 2
+        raise RuntimeError("upstream failed")
+
+    offloaded = AsyncIteratorWrapper(failing_numbers(), offload=True, batch_size=10)
+    assert [await anext(offloaded), await anext(offloaded)] == [1, 2]
+    with pytest.raises(RuntimeError):
+        await anext(offloaded)
+
+    with pytest.raises(ValueError):
+        AsyncIteratorWrapper(iter(()), batch_size=0)
+
+
+@pytest.mark.asyncio
+async def test_cacheable_async_iterator_wrapper_bounded():
+    cached_iter = CacheableAsyncIteratorWrapper(async_generate_numbers(), bounded=True)
+    fast, slow = aiter(cached_iter), aiter(cached_iter)
+
+    assert [await anext(fast) for _ in range(3)] == [0, 1, 2]
+    assert await anext(slow) == 0
+
+    assert cached_iter.trim() == 1
+    del slow
+    assert cached_iter.trim() == 2
+    assert [num async for num in cached_iter] == [3, 4]
+
+
+@pytest.mark.asyncio
+async def test_cacheable_async_iterator_decorator_memoize():
+    calls = 0
+
+    @cacheable_async_iterator(memoize=True)
+    async def decorated_async_generate_numbers(stop):
+        nonlocal calls
+        calls += 1
+        for i in range(stop):
+            await asyncio.sleep(0)
+            yield i
+
+    async def consume():
+        return [num async for num in decorated_async_generate_numbers(5)]
+
+    results = await asyncio.gather(*(consume() for _ in range(100)))
+    assert results == [[0, 1, 2, 3, 4]] * 100
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_cacheable_async_iterator_decorator_stale_while_revalidate(monkeypatch):
+    now = 0.0
+    monkeypatch.setattr("cached_iterators._memo.time.monotonic", lambda: now)
+    generation = 0
+
+    @cacheable_async_iterator(memoize=True, ttl=10, stale_ttl=10)
+    async def decorated_async_generate_numbers():
+        nonlocal generation
+        generation += 1
+        for i in range(3):
+            await asyncio.sleep(0)
+            yield (generation, i)
+
+    first = decorated_async_generate_numbers()
+    assert [value async for value in first] == [(1, 0), (1, 1), (1, 2)]
+
+    now = 15.0
+    assert decorated_async_generate_numbers() is first
+    assert decorated_async_generate_numbers() is first
+    for _ in range(50):
+        await asyncio.sleep(0)
+
+    second = decorated_async_generate_numbers()
+    assert second is not first
+    assert second.done
+    assert [value async for value in second] == [(2, 0), (2, 1), (2, 2)]
+    assert generation == 2
+
+    now = 30.0
+    assert decorated_async_generate_numbers() is second
+    decorated_async_generate_numbers.cache_clear()
+    for _ in range(50):
+        await asyncio.sleep(0)
+
+    # The refresh that was pending during the clear does not bring the old key back.
+    third = decorated_async_generate_numbers()
+    assert third is not second
+    assert [value async for value in third] == [(4, 0), (4, 1), (4, 2)]
+
+    with pytest.raises(ValueError):
+        cacheable_async_iterator(memoize=True, bounded=True)
+    with pytest.raises(ValueError):
+        cacheable_async_iterator(memoize=True, error_ttl=-1)
+    with pytest.raises(ValueError):
+        cacheable_async_iterator(error_ttl=5)
+
+
+@pytest.mark.asyncio
+async def test_cacheable_async_iterator_decorator_failed_refresh(monkeypatch):
+    now = 0.0
+    monkeypatch.setattr("cached_iterators._memo.time.monotonic", lambda: now)
+    calls = 0
+
+    @cacheable_async_iterator(memoize=True, ttl=10, stale_ttl=10, error_ttl=3)
+    async def decorated_async_generate_numbers():
+        nonlocal calls
+        calls += 1
+        if calls > 1:
+            raise ConnectionError("upstream is down")
+        yield 0
+
+    first = decorated_async_generate_numbers()
+    assert [value async for value in first] == [0]
+
+    now = 12.0
+    for _ in range(20):
+        assert decorated_async_generate_numbers() is first
+        await asyncio.sleep(0)
+    assert calls == 2
+
+    now = 15.0
+    for _ in range(20):
+        assert decorated_async_generate_numbers() is first
+        await asyncio.sleep(0)
+    assert calls == 3
+
+
+@pytest.mark.asyncio
+async def test_cacheable_async_iterator_wrapper_prefetch():
+    pulled = []
+
+    async def generate_numbers():
+        for i in range(100):
+            await asyncio.sleep(0)
+            pulled.append(i)
+            yield i
+
+    cached_iter = CacheableAsyncIteratorWrapper(generate_numbers(), prefetch=5)
+    iterator = aiter(cached_iter)
+    assert await anext(iterator) == 0
+
+    for _ in range(50):
+        await asyncio.sleep(0)
+    # The read-ahead window, plus one value waiting for room in it, plus the ones already cached.
+    assert len(pulled) <= 5 + 1 + len(cached_iter.values)
+    assert [num async for num in iterator] == list(range(1, 100))
+    assert [num async for num in cached_iter] == list(range(100))
+
+
+@pytest.mark.asyncio
+async def test_cacheable_async_iterator_wrapper_prefetch_close():
+    async def count():
+        i = 0
+        while True:
+            await asyncio.sleep(0)
+            yield i
+            i += 1
+
+    cached_iter = CacheableAsyncIteratorWrapper(count(), prefetch=2)
+    iterator = aiter(cached_iter)
+    assert await anext(iterator) == 0
+
+    prefetcher = cached_iter._prefetcher
+    cached_iter.close()
+    await asyncio.wait([prefetcher], timeout=1)
+    assert prefetcher.cancelled()
+    assert [num async for num in iterator] == cached_iter.values[1:]
+
+    cached_iter = CacheableAsyncIteratorWrapper(count(), prefetch=2)
+    assert await anext(aiter(cached_iter)) == 0
+    prefetcher = cached_iter._prefetcher
+    del cached_iter
+    await asyncio.wait([prefetcher], timeout=1)
+    assert prefetcher.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_cacheable_async_iterator_wrapper_random_access():
+    cached_iter = CacheableAsyncIteratorWrapper(async_generate_numbers())
+
+    assert await cached_iter[2] == 2
+    assert cached_iter.cached_len == 3
+    assert await cached_iter[1:4] == [1, 2, 3]
+    assert await cached_iter.fill_to(10) == 5
+    assert await cached_iter[-1] == 4
+
+    with pytest.raises(IndexError):
+        await cached_iter[5]
+
+
+@pytest.mark.asyncio
+async def test_cacheable_async_iterator_seek():
+    cached_iter = CacheableAsyncIteratorWrapper(async_generate_numbers())
+    iterator = cached_iter.iter_from(3)
+
+    assert await anext(iterator) == 3
+    assert cached_iter.cached_len == 4
+
+    iterator.seek(0)
+    assert [num async for num in iterator] == [0, 1, 2, 3, 4]
+    assert iterator.tell() == 5
+
+
+@pytest.mark.asyncio
+async def test_cacheable_async_iterator_anext_n():
+    cached_iter = CacheableAsyncIteratorWrapper(async_generate_numbers())
+    iterator = aiter(cached_iter)
+
+    assert await iterator.anext_n(2) == [0, 1]
+    assert await anext(iterator) == 2
+    assert await iterator.anext_n(10) == [3, 4]
+    assert await iterator.anext_n(10) == []
+
+
+@pytest.mark.asyncio
+async def test_cacheable_chunked_async_iterator_wrapper():
+    async def pages():
+        for page in ([0, 1, 2], [], [3, 4], [5, 6, 7, 8, 9]):
+            yield page
+            await asyncio.sleep(0)
+
+    cached_iter = CacheableChunkedAsyncIteratorWrapper(pages(), prefetch=2)
+    iterator = aiter(cached_iter)
+
+    assert [await anext(iterator) for _ in range(4)] == [0, 1, 2, 3]
+    assert [chunk async for chunk in cached_iter.chunks()] == [[0, 1, 2], [3, 4], [5, 6, 7, 8, 9]]
+    assert [num async for num in iterator] == [4, 5, 6, 7, 8, 9]
+    assert [num async for num in cached_iter] == list(range(10))
+    assert await cached_iter[2:6] == [2, 3, 4, 5]
+
+
+@pytest.mark.asyncio
+async def test_cacheable_async_iterator_wrapper_stats():
+    cached_iter = CacheableAsyncIteratorWrapper(async_generate_numbers(), stats=True)
+
+    async def consume():
+        return [num async for num in cached_iter]
+
+    assert await asyncio.gather(consume(), consume(), consume()) == [[0, 1, 2, 3, 4]] * 3
+    assert await aiter(cached_iter).anext_n(10) == [0, 1, 2, 3, 4]
+
+    stats = cached_iter.stats
+    assert stats.pulled == 5
+    assert stats.served == 20
+    assert 5 <= stats.served_from_cache <= 15
+    assert stats.total_consumers == 4
+
+
+@pytest.mark.asyncio
+async def test_cacheable_async_iterator_wrapper_latency():
+    cached_iter = CacheableAsyncIteratorWrapper(async_generate_numbers(), latency=True, prefetch=2)
+
+    assert [num async for num in cached_iter] == [0, 1, 2, 3, 4]
+    assert cached_iter.latency.count == 5
+    assert cached_iter.latency.as_dict()["count"] == 5
+
+
+@pytest.mark.asyncio
+async def test_cacheable_async_iterator_wrapper_blocking():
+    pulled = []
+
+    async def generate():
+        for i in range(100):
+            pulled.append(i)
+            yield i
+            await asyncio.sleep(0)
+
+    cached_iter = CacheableAsyncIteratorWrapper(generate())
+    view = cached_iter.blocking()
+
+    async def consume():
+        return [num async for num in cached_iter]
+
+    threaded, awaited = await asyncio.gather(asyncio.to_thread(list, view), consume())
+    assert threaded == awaited == list(range(100))
+    assert pulled == list(range(100))
+
+    assert await asyncio.to_thread(lambda: view.iter_from(95).next_n(10)) == [95, 96, 97, 98, 99]
+    assert list(view) == list(range(100))
+
+    fresh = CacheableAsyncIteratorWrapper(generate()).blocking()
+    with pytest.raises(RuntimeError):
+        next(iter(fresh))
+
+
+@pytest.mark.asyncio
+async def test_cacheable_async_iterator_wrapper_replays_error():
+    async def failing_numbers():
+        yield 0
+        raise RuntimeError("upstream failed")
+
+    cached_iter = CacheableAsyncIteratorWrapper(failing_numbers())
+
+    async def consume():
+        values = []
+        with pytest.raises(RuntimeError):
+            async for num in cached_iter:
+                values.append(num)
+        return values
+
+    assert await asyncio.gather(consume(), consume(), consume()) == [[0]] * 3
+    assert await cached_iter.iter_from(0).anext_n(5) == [0]
+
+
+@pytest.mark.asyncio
+async def test_cacheable_async_iterator_wrapper_cancelled_consumer():
+    async def slow_numbers():
+        for i in range(5):
+            await asyncio.sleep(0.01)
+            yield i
+
+    cached_iter = CacheableAsyncIteratorWrapper(slow_numbers())
+
+    async def consume():
+        return [num async for num in cached_iter]
+
+    # The first consumer pulls from the original iterator, and is cancelled in the middle of a pull.
+    puller = asyncio.create_task(asyncio.wait_for(consume(), 0.015))
+    await asyncio.sleep(0)
+    consumers = [asyncio.create_task(consume()) for _ in range(3)]
+
+    with pytest.raises(asyncio.TimeoutError):
+        await puller
+    assert await asyncio.gather(*consumers) == [list(range(5))] * 3
+    assert cached_iter.error is None
+
+
+@pytest.mark.asyncio
+async def test_cacheable_async_iterator_wrapper_stops_pulling_without_consumers():
+    async def endless():
+        for i in itertools.count():
+            await asyncio.sleep(0)
+            yield i
+
+    cached_iter = CacheableAsyncIteratorWrapper(endless())
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(cached_iter[-1], 0.02)
+    await asyncio.sleep(0.01)
+    cached = len(cached_iter.values)
+    await asyncio.sleep(0.05)
+    assert len(cached_iter.values) == cached
+
+    assert await cached_iter[cached + 2] == cached + 2
+    await asyncio.sleep(0.01)
+    assert len(cached_iter.values) == cached + 3
+
+
+def test_cacheable_async_iterator_wrapper_blocking_reads_cache_without_loop():
+    loop = asyncio.new_event_loop()
+    try:
+        cached_iter = CacheableAsyncIteratorWrapper(async_generate_numbers(), stats=True)
+        loop.run_until_complete(cached_iter.fill_to(5))
+
+        # The loop is not running, so any round trip to it would block forever.
+        view = cached_iter.blocking(loop)
+        assert view.iter_from(0).next_n(3) == [0, 1, 2]
+        iterator = iter(view)
+        assert [next(iterator) for _ in range(5)] == [0, 1, 2, 3, 4]
+        assert cached_iter.stats.served == 8
+        assert cached_iter.stats.served_from_cache == 8
+    finally:
+        loop.close()
@@ -0,0 +1,108 @@
+import gc
+
+import pytest
+
+from cached_iterators import SharedIteratorWrapper, SharedList
+
+
+def test_shared_iterator_wrapper():
+    cached_iter = SharedIteratorWrapper(iter(range(100)))
+    iterator = iter(cached_iter)
+    assert [next(iterator) for _ in range(10)] == list(range(10))
+
+    with SharedList.attach(cached_iter.name) as values:
+        assert len(values) == 10
+        assert list(values) == list(range(10))
+        assert values[-1] == 9
+        assert values[2:5] == [2, 3, 4]
+        assert not values.done
+
+        assert list(iterator) == list(range(10, 100))
+        assert values.done
+        assert list(values.follow()) == list(range(100))
+
+    cached_iter.unlink()
+
+
+def test_shared_list_trim():
+    values = SharedList(size=1024, capacity=100)
+    for value in range(10):
+        values.append(value)
+
+    assert values.trim(4) == 4
+    assert values.trim(4) == 0
+    assert values.trim(7) == 3
+    assert values.trim(20) == 3
+    assert values[:3] == [None, None, None]
+    assert values[-1] is None
+
+    values.close()
+    values.unlink()
+
+
+def test_shared_list_truncated():
+    values = SharedList(size=64, capacity=1000)
+    for value in range(100):
+        values.append(value)
+
+    assert len(values) == 100
+    assert values[99] == 99
+
+    with SharedList.attach(values.name) as attached:
+        assert attached.truncated
+        assert 0 < len(attached) < 100
+        with pytest.raises(BufferError):
+            list(attached.follow())
+        with pytest.raises(TypeError):
+            attached.append(0)
+
+    values.close()
+    values.unlink()
+
+
+def test_shared_iterator_wrapper_failed():
+    def failing_numbers():
+        yield 1
+        yield 2
+        raise KeyError("upstream failed")
+
+    cached_iter = SharedIteratorWrapper(failing_numbers())
+    with pytest.raises(KeyError):
+        list(cached_iter)
+
+    with SharedList.attach(cached_iter.name) as values:
+        assert values.failed
+        assert not values.truncated
+        assert isinstance(values.error, KeyError)
+        follow = values.follow()
+        assert [next(follow), next(follow)] == [1, 2]
+        with pytest.raises(KeyError):
+            next(follow)
+
+    cached_iter.close()
+    with SharedList.attach(cached_iter.name) as values:
+        with pytest.raises(KeyError):
+            list(values.follow())
+
+    cached_iter.unlink()
+
+
+def test_shared_iterator_wrapper_collected():
+    cached_iter = SharedIteratorWrapper(iter(range(100)))
+    iterator = iter(cached_iter)
+    assert [next(iterator) for _ in range(3)] == [0, 1, 2]
+
+    values = cached_iter.values
+    with SharedList.attach(cached_iter.name) as attached:
+        with pytest.raises(TimeoutError):
+            list(attached.follow(timeout=0.05))
+
+        del cached_iter, iterator
+        gc.collect()
+        follow = attached.follow(timeout=1)
+        assert [next(follow) for _ in range(3)] == [0, 1, 2]
+        with pytest.raises(RuntimeError):
+            next(follow)
+
+    values.close()
+    values.unlink()
@@ -0,0 +1,212 @@
+import pytest
+
+from cached_iterators import (BlockList, CacheableIteratorWrapper, ChunkList,
+                              FileList, PersistentIteratorWrapper, SpillList,
+                              Storage, TypedList)
+from cached_iterators.sync import CacheableIterator
+
+
+def test_block_list():
+    values = BlockList(range(10), block_size=4)
+
+    assert len(values) == 10
+    assert list(values) == list(range(10))
+    assert values[5] == 5
+    assert values[-1] == 9
+    assert values[3:9] == [3, 4, 5, 6, 7, 8]
+    assert values[::4] == [0, 4, 8]
+
+    with pytest.raises(IndexError):
+        values[10]
+    with pytest.raises(ValueError):
+        BlockList(block_size=3)
+
+
+def test_block_list_trim():
+    values = BlockList(range(10), block_size=4)
+
+    assert values.trim(9) == 8
+    assert list(values) == [8, 9]
+    assert values[8] == 8
+    with pytest.raises(IndexError):
+        values[7]
+
+
+def test_block_list_storage():
+    cached_iter = CacheableIteratorWrapper(
+        iter(range(100)), bounded=True, storage=lambda: BlockList(block_size=16)
+    )
+    iterator = iter(cached_iter)
+
+    assert [next(iterator) for _ in range(40)] == list(range(40))
+    cached_iter.trim()
+    assert cached_iter.values._blocks[:3] == [None, None, list(range(32, 40))]
+    assert list(iterator) == list(range(40, 100))
+    assert list(cached_iter) == list(range(40, 100))
+
+
+def test_spill_list():
+    values = SpillList(range(25), max_in_memory=8, read_ahead=3)
+
+    assert len(values) == 25
+    assert len(values._memory) <= 8
+    assert list(values) == list(range(25))
+    assert values[3] == 3
+    assert values[-1] == 24
+    assert values[2:20] == list(range(2, 20))
+
+    values.close()
+
+
+def test_spill_list_storage():
+    cached_iter = CacheableIteratorWrapper(
+        iter(range(1000)), storage=lambda: SpillList(max_in_memory=100), stats=True
+    )
+
+    assert list(cached_iter) == list(range(1000))
+    assert cached_iter.values._spilled > 0
+    # Spilled values are not held in memory, and are not decoded to estimate it.
+    assert 0 < cached_iter.stats.bytes_held == cached_iter.values.nbytes < 100 * 64
+    assert list(CacheableIterator(cached_iter)) == list(range(1000))
+
+
+def test_typed_list():
+    values = TypedList("q", range(100), capacity=8)
+
+    assert len(values) == 100
+    assert values.nbytes == 128 * 8
+    assert values[42] == 42
+    assert values[-1] == 99
+    assert values[10:13] == [10, 11, 12]
+
+    view = values.view(0, 5)
+    values.append(100)
+    assert view.tolist() == [0, 1, 2, 3, 4]
+    assert values.view(98).tolist() == [98, 99, 100]
+
+
+def test_typed_list_struct_format():
+    values = TypedList("<id", [(i, i / 2) for i in range(5)], mapped=True)
+
+    assert values[3] == (3, 1.5)
+    assert list(values) == [(i, i / 2) for i in range(5)]
+    assert len(values.view(1, 3)) == 2 * values.itemsize
+
+
+def test_typed_list_storage():
+    cached_iter = CacheableIteratorWrapper(iter(range(1000)), storage=lambda: TypedList("d"))
+
+    assert list(cached_iter) == list(range(1000))
+    assert list(CacheableIterator(cached_iter)) == list(range(1000))
+
+
+def test_chunk_list():
+    values = ChunkList([[0, 1, 2], [], (3,), range(4, 10)])
+
+    assert len(values) == 10
+    assert values.chunk_count == 3
+    assert list(values) == list(range(10))
+    assert values[5] == 5
+    assert values[-1] == 9
+    assert values[2:8] == [2, 3, 4, 5, 6, 7]
+    assert values.segment(3) == ((3,), 3)
+
+    assert values.trim(5) == 4
+    assert list(values) == list(range(4, 10))
+    with pytest.raises(IndexError):
+        values[3]
+
+
+def test_file_list(tmp_path):
+    path = tmp_path / "values.cit"
+    values = FileList(path)
+    for value in range(10):
+        values.append({"value": value})
+    values.close()
+
+    with open(path, "ab") as file:
+        file.write(b"\x10\x00\x00\x00partial")
+
+    values = FileList(path, read_ahead=3)
+    assert values.stored == 10
+    assert not values.complete
+    assert values[4] == {"value": 4}
+    assert values.segment(8) == ([{"value": 8}, {"value": 9}], 8)
+    values.append({"value": 10})
+    values.finish()
+    values.close()
+
+    values = FileList(path)
+    assert values.complete
+    assert [value["value"] for value in values] == list(range(11))
+    assert values[9:] == [{"value": 9}, {"value": 10}]
+    values.close()
+
+
+def test_storage_protocol(tmp_path):
+    storages = [BlockList(), ChunkList(), SpillList(), TypedList("q"), FileList(tmp_path / "values.cit")]
+
+    for values in storages:
+        assert isinstance(values, Storage)
+        cached_iter = CacheableIteratorWrapper(iter(range(10)), storage=lambda: values)
+        assert list(cached_iter) == list(range(10))
+        assert cached_iter[3:6] == [3, 4, 5]
+        values.close()
+
+    assert not isinstance([], Storage)
+
+
+def test_file_list_single_writer(tmp_path):
+    path = tmp_path / "values.cit"
+    first = PersistentIteratorWrapper(lambda: iter(range(6)), path)
+    assert first.fill_to(3) == 3
+
+    second = PersistentIteratorWrapper(lambda: iter(range(6)), path)
+    assert not second.values.owner
+    assert list(second) == list(range(6))
+    second.values.close()
+
+    assert list(first) == list(range(6))
+    first.values.close()
+
+    values = FileList(path)
+    assert values.complete
+    assert list(values) == list(range(6))
+    values.close()
+
+
+def test_wrapper_releases_storage(tmp_path):
+    path = tmp_path / "values.cit"
+    with CacheableIteratorWrapper(iter(range(10)), storage=lambda: FileList(path)) as cached_iter:
+        assert list(cached_iter) == list(range(10))
+    assert cached_iter.values._file.closed
+
+    spilled = CacheableIteratorWrapper(iter(range(10)), storage=lambda: SpillList(max_in_memory=2))
+    assert list(spilled) == list(range(10))
+    spilled.close()
+    assert list(spilled) == list(range(10))
+    spilled.close(release=True)
+    assert spilled.values._file.closed
+
+
+def test_file_list_trim(tmp_path):
+    path = tmp_path / "values.cit"
+    values = FileList(path)
+    for value in range(3):
+        values.append(value)
+    values.close()
+
+    values = FileList(path)
+    assert values.nbytes == 0
+    for value in range(3, 20_000):
+        values.append(value)
+    assert values[0:2] == [0, 1]
+    assert values.trim(2) == 0
+    assert values.trim(10_000) == 8192
+    assert 0 < values.nbytes < 12_000 * 64
+    assert values.trim(10_000) == 0
+    assert values[1] == 1
+    assert values[19_999] == 19_999
+    with pytest.raises(IndexError):
+        values[5]
+    values.close()
@@ -1,4 +1,11 @@
-from cached_iterators import CacheableIteratorWrapper, cacheable_iterator
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from cached_iterators import (BlockList, CacheableChunkedIteratorWrapper, CacheableIteratorWrapper,
+                              cacheable_iterator)
 
 
 def generate_numbers():
@@ -34,3 +41,347 @@ def test_cacheable_iterator_decorator():
     assert second_pass == [0, 1, 2, 3, 4]
 
     assert first_pass == second_pass
+
+
+def test_cacheable_iterator_thread_safe():
+    pulled = []
+
+    def slow_generate_numbers():
+        for i in range(200):
+            time.sleep(0)
+            pulled.append(i)
+            yield i
+
+    cached_iter = CacheableIteratorWrapper(slow_generate_numbers(), thread_safe=True)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: list(cached_iter), range(8)))
+
+    assert results == [list(range(200))] * 8
+    assert pulled == list(range(200))
+
+
+def test_cacheable_iterator_wrapper_done():
+    cached_iter = CacheableIteratorWrapper(generate_numbers())
+    assert not cached_iter.done
+
+    list(cached_iter)
+    assert cached_iter.done
+    assert type(iter(cached_iter)) is type(iter([]))
+    assert list(cached_iter) == [0, 1, 2, 3, 4]
+
+
+def test_cacheable_iterator_wrapper_bounded():
+    cached_iter = CacheableIteratorWrapper(iter(range(10)), bounded=True)
+    fast, slow = iter(cached_iter), iter(cached_iter)
+
+    assert [next(fast) for _ in range(6)] == [0, 1, 2, 3, 4, 5]
+    assert [next(slow) for _ in range(3)] == [0, 1, 2]
+
+    assert cached_iter.trim() == 3
+    assert cached_iter.offset == 3
+    assert isinstance(cached_iter.values, BlockList)
+    with pytest.raises(IndexError):
+        cached_iter[2]
+
+    del slow
+    assert cached_iter.trim() == 3
+    assert list(cached_iter) == [6, 7, 8, 9]
+    assert list(fast) == [6, 7, 8, 9]
+
+
+def test_cacheable_iterator_wrapper_bounded_releases_blocks():
+    cached_iter = CacheableIteratorWrapper(iter(range(100_000)), bounded=True)
+    iterator = iter(cached_iter)
+    for _ in iterator:
+        pass
+
+    held = [block for block in cached_iter.values._blocks if block is not None]
+    assert len(held) <= 2
+
+
+def test_cacheable_iterator_decorator_memoize():
+    calls = []
+
+    @cacheable_iterator(memoize=True, maxsize=2)
+    def decorated_generate_numbers(stop, step=1):
+        calls.append((stop, step))
+        yield from range(0, stop, step)
+
+    assert list(decorated_generate_numbers(5)) == [0, 1, 2, 3, 4]
+    assert list(decorated_generate_numbers(5)) == [0, 1, 2, 3, 4]
+    assert decorated_generate_numbers(6, step=2) is decorated_generate_numbers(6, step=2)
+    assert calls == [(5, 1)]
+
+    with pytest.raises(ValueError):
+        cacheable_iterator(memoize=True, bounded=True)
+    with pytest.raises(ValueError):
+        cacheable_iterator(memoize=True, error_ttl=-1)
+    with pytest.raises(ValueError):
+        cacheable_iterator(error_ttl=5)
+
+    list(decorated_generate_numbers(6, step=2))
+    decorated_generate_numbers(7)
+    list(decorated_generate_numbers(5))
+    assert calls == [(5, 1), (6, 2), (5, 1)]
+
+    decorated_generate_numbers.cache_clear()
+    list(decorated_generate_numbers(7))
+    assert calls == [(5, 1), (6, 2), (5, 1), (7, 1)]
+
+
+def test_cacheable_iterator_decorator_memoize_ttl(monkeypatch):
+    now = 0.0
+    monkeypatch.setattr("cached_iterators._memo.time.monotonic", lambda: now)
+
+    @cacheable_iterator(memoize=True, ttl=10, key=lambda stop: stop % 2)
+    def decorated_generate_numbers(stop):
+        yield from range(stop)
+
+    first = decorated_generate_numbers(5)
+    assert decorated_generate_numbers(7) is first
+    now = 10.0
+    assert decorated_generate_numbers(5) is not first
+
+
+def test_cacheable_iterator_wrapper_prefetch():
+    pulled = []
+
+    def generate_numbers_slowly():
+        for i in range(100):
+            pulled.append(i)
+            yield i
+
+    cached_iter = CacheableIteratorWrapper(generate_numbers_slowly(), prefetch=5)
+    iterator = iter(cached_iter)
+    assert next(iterator) == 0
+
+    time.sleep(0.05)
+    # The read-ahead window, plus one value waiting for room in it, plus the ones already cached.
+    assert len(pulled) <= 5 + 1 + len(cached_iter.values)
+    assert list(iterator) == list(range(1, 100))
+    assert list(cached_iter) == list(range(100))
+
+    prefetcher = cached_iter._prefetcher
+    del cached_iter, iterator
+    prefetcher.join(timeout=1)
+    assert not prefetcher.is_alive()
+
+
+def test_cacheable_iterator_wrapper_prefetch_close():
+    cached_iter = CacheableIteratorWrapper(itertools.count(), prefetch=2)
+    iterator = iter(cached_iter)
+    assert next(iterator) == 0
+
+    cached_iter.close()
+    cached_iter._prefetcher.join(timeout=1)
+    assert not cached_iter._prefetcher.is_alive()
+    assert list(iterator) == cached_iter.values[1:]
+
+
+def test_cacheable_iterator_wrapper_random_access():
+    cached_iter = CacheableIteratorWrapper(iter(range(100)))
+
+    assert cached_iter[10] == 10
+    assert cached_iter.cached_len == 11
+    assert cached_iter[5:15] == list(range(5, 15))
+    assert cached_iter.cached_len == 15
+    assert cached_iter.fill_to(20) == 20
+    assert cached_iter[-1] == 99
+    assert cached_iter[::-30] == [99, 69, 39, 9]
+    assert cached_iter.fill_to(1000) == 100
+
+    with pytest.raises(IndexError):
+        cached_iter[100]
+
+
+def test_cacheable_iterator_seek():
+    pulled = []
+
+    def generate_numbers_logged():
+        for i in range(10):
+            pulled.append(i)
+            yield i
+
+    cached_iter = CacheableIteratorWrapper(generate_numbers_logged())
+    iterator = cached_iter.iter_from(3)
+    assert iterator.tell() == 3
+    assert next(iterator) == 3
+    assert pulled == [0, 1, 2, 3]
+
+    iterator.seek(1)
+    assert [next(iterator), next(iterator)] == [1, 2]
+    assert pulled == [0, 1, 2, 3]
+
+    iterator.seek(8)
+    assert list(iterator) == [8, 9]
+    assert iterator.tell() == 10
+
+    with pytest.raises(ValueError):
+        iterator.seek(-1)
+
+    bounded_iter = CacheableIteratorWrapper(iter(range(10)), bounded=True)
+    iterator = bounded_iter.iter_from(5)
+    assert bounded_iter.trim() == 0
+    assert next(iterator) == 5
+    assert bounded_iter.trim() == 6
+    with pytest.raises(IndexError):
+        iterator.seek(5)
+
+
+def test_cacheable_iterator_next_n():
+    cached_iter = CacheableIteratorWrapper(iter(range(10)))
+    iterator = iter(cached_iter)
+
+    assert iterator.next_n(4) == [0, 1, 2, 3]
+    assert next(iterator) == 4
+    assert iterator.next_n(10) == [5, 6, 7, 8, 9]
+    assert iterator.next_n(10) == []
+    assert cached_iter.iter_from(0).next_n(3) == [0, 1, 2]
+
+
+def test_cacheable_chunked_iterator_wrapper():
+    pages = iter([[0, 1, 2], [], [3, 4], [5, 6, 7, 8, 9]])
+    cached_iter = CacheableChunkedIteratorWrapper(pages)
+    iterator = iter(cached_iter)
+
+    assert [next(iterator) for _ in range(4)] == [0, 1, 2, 3]
+    assert cached_iter.cached_len == 5
+    assert list(cached_iter.chunks()) == [[0, 1, 2], [3, 4], [5, 6, 7, 8, 9]]
+    assert list(iterator) == [4, 5, 6, 7, 8, 9]
+    assert list(cached_iter) == list(range(10))
+    assert cached_iter[2:6] == [2, 3, 4, 5]
+
+    bounded_iter = CacheableChunkedIteratorWrapper(iter([[0, 1], [2, 3], [4]]), bounded=True)
+    chunks = bounded_iter.chunks()
+    assert next(chunks) == [0, 1]
+    assert next(chunks) == [2, 3]
+    assert bounded_iter.trim() == 4
+    assert list(bounded_iter) == [4]
+
+
+def test_cacheable_iterator_wrapper_stats():
+    reports = []
+    cached_iter = CacheableIteratorWrapper(iter(range(2000)), on_stats=lambda stats: reports.append(stats.pulled))
+    iterator = iter(cached_iter)
+
+    assert [next(iterator) for _ in range(10)] == list(range(10))
+    assert list(iter(cached_iter))[:3] == [0, 1, 2]
+    stats = cached_iter.stats
+    assert stats.pulled == 2000
+    assert stats.served == 2010
+    assert stats.served_from_cache == 10
+    assert stats.total_consumers == 2
+    assert stats.active_consumers == 1
+    assert stats.peak_length == stats.length == 2000
+    assert stats.bytes_held > 2000 * 8
+    assert stats.upstream_wait > 0
+    assert reports == [1024, 2000]
+    assert stats.as_dict()["served"] == 2010
+
+    assert CacheableIteratorWrapper(iter(())).stats is None
+
+
+def test_cacheable_iterator_wrapper_latency():
+    def pages():
+        for index in range(5):
+            if index == 3:
+                time.sleep(0.02)
+            yield index
+
+    slow = []
+    cached_iter = CacheableIteratorWrapper(
+        pages(), slow_threshold=0.01, on_slow=lambda index, duration: slow.append((index, duration))
+    )
+
+    assert list(cached_iter) == [0, 1, 2, 3, 4]
+    assert [index for index, _ in slow] == [3]
+    assert slow[0][1] >= 0.02
+    assert cached_iter.latency.count == 5
+    assert cached_iter.latency.max >= 0.02
+    assert 0.01 <= cached_iter.latency.quantile(1) <= cached_iter.latency.max
+    assert sum(count for _, count in cached_iter.latency.buckets()) == 5
+
+    assert CacheableIteratorWrapper(iter(())).latency is None
+    with pytest.raises(ValueError):
+        CacheableIteratorWrapper(iter(()), on_slow=print)
+
+
+def test_cacheable_iterator_decorator_persist(tmp_path):
+    calls = []
+
+    def restart():
+        @cacheable_iterator(persist=tmp_path)
+        def numbers(n):
+            calls.append(n)
+            yield from range(n)
+
+        return numbers
+
+    numbers = restart()
+    iterator = iter(numbers(10))
+    assert [next(iterator) for _ in range(4)] == [0, 1, 2, 3]
+    assert numbers(10) is iterator.wrapper
+    del iterator
+
+    assert list(restart()(10)) == list(range(10))
+    assert calls == [10, 10]
+
+    cached_iter = restart()(10)
+    assert cached_iter.done
+    assert list(cached_iter) == list(range(10))
+    assert cached_iter[7] == 7
+    assert list(restart()(3)) == [0, 1, 2]
+    assert calls == [10, 10, 3]
+
+    with pytest.raises(ValueError):
+        cacheable_iterator(persist=tmp_path, bounded=True)
+
+    @cacheable_iterator(persist=tmp_path / "missing" / "cache")
+    def letters():
+        yield from "abc"
+
+    assert list(letters()) == ["a", "b", "c"]
+    assert len(list((tmp_path / "missing" / "cache").iterdir())) == 1
+
+
+def test_cacheable_iterator_wrapper_replays_error():
+    calls = 0
+
+    def failing_numbers():
+        nonlocal calls
+        calls += 1
+        yield 0
+        yield 1
+        raise RuntimeError("upstream failed")
+
+    for options in ({}, {"prefetch": 4}):
+        cached_iter = CacheableIteratorWrapper(failing_numbers(), **options)
+        first, second = iter(cached_iter), iter(cached_iter)
+
+        assert [next(first), next(first)] == [0, 1]
+        with pytest.raises(RuntimeError):
+            next(first)
+        with pytest.raises(RuntimeError):
+            next(first)
+        assert second.next_n(10) == [0, 1]
+        with pytest.raises(RuntimeError):
+            second.next_n(10)
+        with pytest.raises(RuntimeError):
+            list(cached_iter)
+        assert isinstance(cached_iter.error, RuntimeError)
+
+    @cacheable_iterator(memoize=True, error_ttl=0.05)
+    def decorated(stop):
+        return failing_numbers()
+
+    calls = 0
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            list(decorated(2))
+    assert calls == 1
+
+    time.sleep(0.05)
+    with pytest.raises(RuntimeError):
+        list(decorated(2))
+    assert calls == 2